@@ -0,0 +1,163 @@
+import os
+import math
+import time
+import asyncio
+from app.cache import LRUTTLCache
+from app.metrics import Counter, Gauge
+from app.responses import FastJSONResponse
+
+# Requests served at once; further requests wait in a queue of at most ADMISSION_QUEUE_DEPTH.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "128"))
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", "256"))
+# Longest a request may wait for a slot. Requests whose estimated wait is already longer
+# are shed on arrival instead of queueing.
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Sustained requests per minute and burst size allowed per client; 0 disables rate limiting.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+# Header identifying the client, set by a gateway that authenticates users. Only configure
+# it when clients cannot set it themselves: otherwise a new value per request skips the
+# limit. Unset, clients are limited by address; behind a proxy, run uvicorn with
+# --forwarded-allow-ips set to the proxy so the address comes from X-Forwarded-For.
+CLIENT_ID_HEADER = os.getenv("CLIENT_ID_HEADER", "").strip().lower().encode("latin-1")
+
+admission_queue_depth = Gauge("admission_queue_depth", "Requests waiting for an admission slot.")
+admission_in_flight = Gauge("admission_in_flight", "Requests currently admitted.")
+admission_shed = Counter("admission_shed_total", "Requests rejected by admission control.", ("path", "reason"))
+
+class Shed(Exception):
+    """
+    Raised when a request is refused; reason is "rate_limited", "queue_full" or "deadline".
+    """
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Holds up to burst tokens, refilled continuously at rate tokens per second.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Takes one token and returns 0, or returns the seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionController:
+    """
+    Bounds concurrent requests and the queue in front of them. Service time is tracked as an
+    exponentially weighted average, so the wait for a new arrival can be estimated and
+    requests that would miss queue_timeout are refused immediately.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, queue_depth: int = ADMISSION_QUEUE_DEPTH,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = 1.0
+        self._slots = None
+
+    def estimated_wait(self) -> float:
+        if self.in_flight < self.max_in_flight:
+            return 0.0
+        return (self.waiting + 1) * self.service_time / self.max_in_flight
+
+    async def acquire(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        wait = self.estimated_wait()
+        if self.waiting >= self.queue_depth:
+            raise Shed("queue_full", 503, wait)
+        if wait > self.queue_timeout:
+            raise Shed("deadline", 503, wait)
+        self.waiting += 1
+        admission_queue_depth.set(self.waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Shed("deadline", 503, self.estimated_wait()) from None
+        finally:
+            self.waiting -= 1
+            admission_queue_depth.set(self.waiting)
+        self.in_flight += 1
+        admission_in_flight.set(self.in_flight)
+
+    def release(self, service_time: float) -> None:
+        self.in_flight -= 1
+        admission_in_flight.set(self.in_flight)
+        self.service_time += 0.1 * (service_time - self.service_time)
+        self._slots.release()
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying per-client token buckets and the admission queue to the given
+    paths. Refused requests get an immediate 429 (rate limited) or 503 (overloaded) with
+    Retry-After instead of waiting behind slow upstream calls.
+    """
+
+    def __init__(self, app, paths: set, controller: AdmissionController = None):
+        self.app = app
+        self.paths = paths
+        self.controller = controller or AdmissionController()
+        self.buckets = LRUTTLCache(maxsize=100_000, ttl=3600)
+
+    def client_key(self, scope) -> str:
+        if CLIENT_ID_HEADER:
+            for name, value in scope["headers"]:
+                if name == CLIENT_ID_HEADER:
+                    return "id:" + value.decode("latin-1")
+        client = scope.get("client")
+        return "addr:" + (client[0] if client else "")
+
+    def check_rate(self, scope) -> None:
+        if RATE_LIMIT_PER_MINUTE <= 0:
+            return
+        key = self.client_key(scope)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+            self.buckets.set(key, bucket)
+        wait = bucket.take()
+        if wait > 0:
+            raise Shed("rate_limited", 429, wait)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            self.check_rate(scope)
+            await self.controller.acquire()
+        except Shed as e:
+            admission_shed.inc(path=scope["path"], reason=e.reason)
+            response = FastJSONResponse(
+                {"detail": "Too many requests." if e.status_code == 429 else "Server is busy, try again later."},
+                status_code=e.status_code,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
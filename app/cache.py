@@ -0,0 +1,45 @@
+import time
+import threading
+from collections import OrderedDict
+
+class LRUTTLCache:
+    """
+    A bounded, thread-safe mapping that evicts the least recently used entry when full
+    and treats entries older than ttl seconds as missing.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, created = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, created: float = None):
+        with self._lock:
+            self._entries[key] = (value, time.time() if created is None else created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def keys(self) -> list:
+        """
+        Returns a snapshot of the unexpired keys, least recently used first.
+        """
+        now = time.time()
+        with self._lock:
+            return [key for key, (_, created) in self._entries.items() if now - created <= self.ttl]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,206 @@
+import os
+import time
+import asyncio
+import datetime
+import numpy as np
+from typing import Any, Optional
+from pydantic import BaseModel, ValidationError
+from app.energy import energy_budgets
+from app.get_personalized_recommendations import (
+    RECOMMENDATION_COMPLETION_PARAMS,
+    RECOMMENDATION_ENGINE,
+    build_recommendation_messages,
+    determine_meal_context,
+    parse_recommendations,
+    summarize_user_profile,
+)
+from app.logs import get_logger
+from app.model_router import routed_completion
+from app.recommendation_cache import normalize_conditions, personalize_cached, recommendation_cache
+from app.recommendation_engine import rank_recommendations
+from app.resilience import UpstreamError
+
+logger = get_logger(__name__)
+
+# Users accepted in one cohort request.
+COHORT_MAX_USERS = int(os.getenv("COHORT_MAX_USERS", "10000"))
+# Width, in kcal, of the remaining-budget bands users are grouped by. Each bucket's
+# recommendations are generated for the middle of its band.
+COHORT_BUDGET_BAND = float(os.getenv("COHORT_BUDGET_BAND", "200"))
+# Buckets generated at once.
+COHORT_CONCURRENCY = int(os.getenv("COHORT_CONCURRENCY", "16"))
+
+NUTRIENT_COLUMNS = ("calories", "carbs", "protein", "fats", "sodium")
+
+class CohortUser(BaseModel):
+    id: Any = None
+    food_totals: Optional[dict] = None
+    user_profile: Optional[dict] = None
+    current_time: Optional[str] = None
+
+def validate_user(user) -> tuple:
+    """
+    Returns (user, None) with the user's fields checked, or (None, error) describing why
+    the user cannot be processed.
+    """
+    try:
+        return CohortUser.model_validate(user).model_dump(), None
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'user'}: {error['msg']}" for error in e.errors()
+        )
+        return None, f"Invalid user: {problems}"
+
+def _number(value) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if np.isfinite(number) else 0.0
+
+def _rounded(value: float):
+    return round(float(value), 1) if np.isfinite(value) else None
+
+async def generate_bucket(key: tuple, current_time: str, food_totals: dict, slots: asyncio.Semaphore) -> tuple:
+    """
+    Returns (recommendations, generated) for a (meal context, budget band, conditions) bucket,
+    from the recommendation cache or from one upstream call. generated is False on a cache hit.
+    Failures are returned as {"error": ...}, with "status" for upstream timeouts and outages.
+    """
+    meal_context, band, conditions = key
+    cache_key = ("cohort",) + key
+    cached = recommendation_cache.get(cache_key)
+    if cached is not None:
+        return cached, False
+    remaining_cal = "unspecified" if band is None else (band + 0.5) * COHORT_BUDGET_BAND
+    profile = {"medicalConditions": ", ".join(conditions)} if conditions else {}
+    if RECOMMENDATION_ENGINE == "local":
+        return rank_recommendations(food_totals, profile, meal_context, remaining_cal), True
+    messages = build_recommendation_messages(
+        current_time, meal_context, summarize_user_profile(profile), food_totals, remaining_cal
+    )
+    async with slots:
+        try:
+            output = await routed_completion(
+                "recommend_cohort",
+                parse_recommendations,
+                messages=messages,
+                **RECOMMENDATION_COMPLETION_PARAMS,
+            )
+        except UpstreamError as e:
+            return {"error": str(e), "status": e.status_code}, True
+        except Exception as e:
+            logger.warning("Cohort bucket %s failed: %s", key, e)
+            return {"error": f"Error generating personalized recommendations: {str(e)}"}, True
+    recommendation_cache.set(cache_key, output)
+    return output, True
+
+async def cohort_recommendations(users: list, current_time: str = None) -> dict:
+    """
+    Generates recommendations for many users at once. Each user is a dict with "food_totals",
+    "user_profile" and optionally "id" and "current_time" (overriding the request's).
+
+    BMR, TDEE and the remaining calorie budget are computed for all users in one NumPy pass.
+    Users are then grouped by meal context, COHORT_BUDGET_BAND budget band and medical
+    conditions, and each bucket gets one set of recommendations, generated for the bucket's
+    mid-band budget and mean intake. Every user receives the bucket's recommendations with
+    "remainingAfter" recomputed from their own budget. "stats" reports bucket counts and
+    timings for the request.
+
+    Users that fail validation get {"id", "error"} in their slot and are left out of the
+    budgets and buckets; the rest of the request is unaffected.
+    """
+    start = time.perf_counter()
+    if current_time is None:
+        current_time = datetime.datetime.now().strftime("%I:%M %p")
+    results = [None] * len(users)
+    # Request positions of the users that passed validation, in order.
+    valid = []
+    checked_users = []
+    for slot, user in enumerate(users):
+        checked, error = validate_user(user)
+        if error is None:
+            valid.append(slot)
+            checked_users.append(checked)
+        else:
+            results[slot] = {"id": user.get("id") if isinstance(user, dict) else None, "error": error}
+    users = checked_users
+
+    profiles = [user.get("user_profile") or {} for user in users]
+    intake = [user.get("food_totals") or {} for user in users]
+    consumed = np.array(
+        [[_number(food_totals.get(column)) for column in NUTRIENT_COLUMNS] for food_totals in intake],
+        dtype=np.float64,
+    ).reshape(len(users), len(NUTRIENT_COLUMNS))
+    budgets = energy_budgets(profiles, consumed[:, 0])
+    budget_done = time.perf_counter()
+
+    times = [user.get("current_time") or current_time for user in users]
+    meal_contexts = {time_str: determine_meal_context(time_str) for time_str in set(times)}
+    bands = np.floor(budgets["remaining"] / COHORT_BUDGET_BAND)
+    buckets = {}
+    bucket_times = []
+    membership = np.empty(len(users), dtype=np.intp)
+    for index, (time_str, band, profile) in enumerate(zip(times, bands, profiles)):
+        key = (
+            meal_contexts[time_str],
+            int(band) if np.isfinite(band) else None,
+            normalize_conditions(profile.get("medicalConditions")),
+        )
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = len(buckets)
+            bucket_times.append(time_str)
+        membership[index] = bucket
+    # Mean intake per bucket, used as the bucket's "consumed today" in the prompt.
+    sizes = np.bincount(membership, minlength=len(buckets))
+    mean_consumed = np.zeros((len(buckets), len(NUTRIENT_COLUMNS)))
+    np.add.at(mean_consumed, membership, consumed)
+    mean_consumed /= np.maximum(sizes, 1)[:, None]
+    bucketing_done = time.perf_counter()
+
+    slots = asyncio.Semaphore(COHORT_CONCURRENCY)
+    generated = await asyncio.gather(*(
+        generate_bucket(
+            key,
+            bucket_times[bucket],
+            {column: round(float(value), 1) for column, value in zip(NUTRIENT_COLUMNS, mean_consumed[bucket])},
+            slots,
+        )
+        for key, bucket in buckets.items()
+    ))
+    generation_done = time.perf_counter()
+
+    for index, user in enumerate(users):
+        output = generated[membership[index]][0]
+        remaining = budgets["remaining"][index]
+        remaining_cal = round(float(remaining), 1) if np.isfinite(remaining) else "unspecified"
+        result = {
+            "id": user.get("id"),
+            "meal_context": meal_contexts[times[index]],
+            "bmr": _rounded(budgets["bmr"][index]),
+            "tdee": _rounded(budgets["tdee"][index]),
+            "remaining": remaining_cal,
+        }
+        if "error" in output:
+            result.update(output)
+        else:
+            result["recommendations"] = personalize_cached(output, remaining_cal)["recommendations"]
+        results[valid[index]] = result
+    end = time.perf_counter()
+
+    return {
+        "results": results,
+        "stats": {
+            "users": len(results),
+            "invalid_users": len(results) - len(users),
+            "buckets": len(buckets),
+            "generated_buckets": sum(1 for _, was_generated in generated if was_generated),
+            "failed_buckets": sum(1 for output, _ in generated if "error" in output),
+            "budget_ms": round((budget_done - start) * 1000, 2),
+            "bucketing_ms": round((bucketing_done - budget_done) * 1000, 2),
+            "generation_ms": round((generation_done - bucketing_done) * 1000, 2),
+            "total_ms": round((end - start) * 1000, 2),
+            "users_per_second": round(len(results) / max(end - start, 1e-9), 1),
+        },
+    }
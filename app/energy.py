@@ -0,0 +1,62 @@
+import numpy as np
+
+# Mifflin-St Jeor: BMR = 10 * weight (kg) + 6.25 * height (cm) - 5 * age + offset.
+# Profiles without a recognized sex get the midpoint of the two offsets.
+SEX_OFFSETS = {"male": 5.0, "m": 5.0, "female": -161.0, "f": -161.0}
+UNKNOWN_SEX_OFFSET = -78.0
+
+# Activity multipliers applied to BMR, interpolated between these average daily step counts
+# (sedentary, lightly, moderately, very and extra active). Missing steps count as sedentary.
+STEP_LEVELS = np.array([0.0, 5000.0, 7500.0, 10000.0, 12500.0])
+ACTIVITY_FACTORS = np.array([1.2, 1.375, 1.55, 1.725, 1.9])
+
+def profile_column(profiles: list, field: str) -> np.ndarray:
+    """
+    Returns the field of every profile as a float array, with NaN where it is missing or
+    not a positive, finite number.
+    """
+    def value(profile: dict) -> float:
+        try:
+            number = float(profile.get(field))
+        except (TypeError, ValueError):
+            return np.nan
+        return number if 0 < number < np.inf else np.nan
+    return np.fromiter((value(profile) for profile in profiles), dtype=np.float64, count=len(profiles))
+
+def sex_offsets(profiles: list) -> np.ndarray:
+    return np.fromiter(
+        (SEX_OFFSETS.get(str(profile.get("sex") or profile.get("gender") or "").strip().lower(), UNKNOWN_SEX_OFFSET)
+         for profile in profiles),
+        dtype=np.float64, count=len(profiles),
+    )
+
+def basal_metabolic_rate(age: np.ndarray, weight: np.ndarray, height: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    """
+    Mifflin-St Jeor BMR in kcal/day; NaN where age, weight or height is missing.
+    """
+    return 10.0 * weight + 6.25 * height - 5.0 * age + offset
+
+def total_energy_expenditure(bmr: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """
+    BMR scaled by the activity factor for the average daily step count.
+    """
+    return bmr * np.interp(np.nan_to_num(steps, nan=0.0), STEP_LEVELS, ACTIVITY_FACTORS)
+
+def energy_budgets(profiles: list, consumed: np.ndarray) -> dict:
+    """
+    Computes, for all profiles at once, BMR, TDEE, the daily calorie target and the calorie
+    budget remaining after consumed kcal. The target is the profile's dailyCalorieTarget,
+    else its estimatedExpenditure, else the estimated TDEE. Values that cannot be determined
+    are NaN.
+    """
+    bmr = basal_metabolic_rate(
+        profile_column(profiles, "age"),
+        profile_column(profiles, "weight"),
+        profile_column(profiles, "height"),
+        sex_offsets(profiles),
+    )
+    tdee = total_energy_expenditure(bmr, profile_column(profiles, "stepsPerDay"))
+    target = profile_column(profiles, "dailyCalorieTarget")
+    target = np.where(np.isnan(target), profile_column(profiles, "estimatedExpenditure"), target)
+    target = np.where(np.isnan(target), tdee, target)
+    return {"bmr": bmr, "tdee": tdee, "target": target, "remaining": target - consumed}
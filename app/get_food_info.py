@@ -1,67 +1,159 @@
 import os
-import base64
-from dotenv import load_dotenv
-from openai import OpenAI
-import json
+from app.llm_output import parse_llm_json
+from app.logs import get_logger
+from app.model_router import check_confidence, check_dish_name, check_nutrition, routed_completion
+from app.resilience import UpstreamError
 
-# Load environment variables from .env
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
+# "compact" asks only for the fields /analyze returns, through a strict function schema with
+# short keys; "verbose" asks for the full dish identification and nutrient breakdown.
+ANALYZE_MODE = os.getenv("ANALYZE_MODE", "compact")
+COMPACT_MAX_COMPLETION_TOKENS = int(os.getenv("ANALYZE_COMPACT_MAX_TOKENS", "64"))
 
-# Instantiate the OpenAI client for API calls.
-client = OpenAI(api_key=openai_api_key)
+logger = get_logger(__name__)
 
-def encode_image(image_path: str) -> str:
+# Fixed instructions sent first, as the system message, so every request shares the same
+# prompt prefix and the provider can serve it from its prompt cache.
+FOOD_INFO_SYSTEM_PROMPT = (
+    "Identify the dish in the image provided by the user and provide its nutritional information for one portion. "
+    "Assume it is a Singaporean dish commonly found at hawker centers or local restaurants. "
+    "Output your answer as a valid JSON object with the following keys:\n\n"
+    "Dish Identification: name, grain_starch, base, meats, vegetables, additional_ingredients, portion_size.\n\n"
+    "Nutrition: calories, carbs, protein, fats, sodium, fiber, vitamins (vitamin_a, vitamin_c, vitamin_d), other_nutrients.\n\n"
+    "Ensure your output is strictly valid JSON without any extra text."
+)
+
+COMPACT_FOOD_INFO_SYSTEM_PROMPT = (
+    "Identify the dish in the image provided by the user. "
+    "Assume it is a Singaporean dish commonly found at hawker centers or local restaurants. "
+    "Report its name and nutrition for the given portion by calling report_dish, "
+    "with conf set to how confident you are in the identification (0 to 1)."
+)
+
+# Short keys keep the generated arguments to a few dozen tokens.
+COMPACT_FOOD_INFO_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "report_dish",
+        "strict": True,
+        "description": "Dish name and nutrition for the given portion.",
+        "parameters": {
+            "type": "object",
+            "required": ["n", "cal", "c", "p", "f", "na", "conf"],
+            "properties": {
+                "n": {"type": "string", "description": "Dish name"},
+                "cal": {"type": "number", "description": "Calories"},
+                "c": {"type": "number", "description": "Carbohydrates in grams"},
+                "p": {"type": "number", "description": "Protein in grams"},
+                "f": {"type": "number", "description": "Fat in grams"},
+                "na": {"type": "number", "description": "Sodium in milligrams"},
+                "conf": {"type": "number", "description": "Identification confidence from 0 to 1"},
+            },
+            "additionalProperties": False,
+        },
+    },
+}
+
+def expand_compact_food_info(compact: dict) -> dict:
+    """
+    Maps report_dish arguments onto the verbose output shape used by /analyze.
+    """
+    return {
+        "Dish Identification": {"name": compact["n"], "confidence": compact.get("conf")},
+        "Nutrition": {
+            "calories": compact["cal"],
+            "carbs": compact["c"],
+            "protein": compact["p"],
+            "fats": compact["f"],
+            "sodium": compact["na"],
+        },
+    }
+
+def parse_compact_food_info(completion) -> dict:
+    """
+    Expands the report_dish call of a compact completion, raising if it is malformed.
     """
-    Encodes an image to Base64 format.
+    compact = parse_llm_json(completion.choices[0].message.tool_calls[0].function.arguments)
+    return expand_compact_food_info(compact)
+
+def parse_verbose_food_info(completion) -> dict:
+    """
+    Parses a verbose completion, raising if it is malformed.
     """
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    response_str = completion.choices[0].message.content
+    logger.debug("Raw model response: %s", response_str)
+    return parse_llm_json(response_str)
 
-def get_food_info(image_path: str, portion: float = 1.0) -> dict:
-    image_base64 = encode_image(image_path)
+def validate_food_info(output: dict) -> None:
+    """
+    Raises LowConfidenceError for an unknown dish, implausible nutrients or low self-reported
+    confidence, so the router escalates to the next model tier; raises ValueError if the
+    fields are missing or of the wrong type.
+    """
+    check_dish_name(output["Dish Identification"]["name"])
+    check_nutrition(output["Nutrition"])
+    check_confidence(output["Dish Identification"].get("confidence"))
+
+async def get_food_info(image_base64: str, portion: float = 1.0, detail: str = "auto",
+                        mode: str = ANALYZE_MODE) -> dict:
+    """
+    Identifies the dish in a Base64-encoded JPEG and returns its nutritional information.
+    detail is passed through as the vision detail level ("low", "high" or "auto").
+    In compact mode only the name, calories, carbs, protein, fats and sodium are requested,
+    returned in the same "Dish Identification"/"Nutrition" shape as verbose mode.
+    The cheaper model tier answers first; unknown dishes, implausible nutrients and malformed
+    output are escalated to the next tier of the "analyze" route. If the last tier's answer
+    is well-formed but still fails those checks (e.g. a photo of something that is not food),
+    it is returned rather than reported as an error.
+    Upstream timeouts and outages raise UpstreamError; other failures return {"error": ...}.
+    """
+    user_message = {
+        "role": "user",
+        "content": [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{image_base64}",
+                    "detail": detail,
+                },
+            },
+            {
+                "type": "text",
+                "text": f"Portion: {portion}"
+            }
+        ],
+    }
+    if mode == "compact":
+        try:
+            return await routed_completion(
+                "analyze",
+                parse_compact_food_info,
+                validate_food_info,
+                messages=[{"role": "system", "content": COMPACT_FOOD_INFO_SYSTEM_PROMPT}, user_message],
+                tools=[COMPACT_FOOD_INFO_TOOL],
+                tool_choice={"type": "function", "function": {"name": "report_dish"}},
+                temperature=0.5,
+                max_completion_tokens=COMPACT_MAX_COMPLETION_TOKENS,
+                # Sent as a raw body field so SDK versions without a prompt_cache_key argument still work.
+                extra_body={"prompt_cache_key": "analyze-compact"},
+            )
+        except UpstreamError:
+            raise
+        except Exception as e:
+            return {"error": f"Error in get_food_info: {str(e)}"}
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                "Identify the dish in this image and provide its nutritional information for one portion. "
-                                "Assume it is a Singaporean dish commonly found at hawker centers or local restaurants. "
-                                "Output your answer as a valid JSON object with the following keys:\n\n"
-                                "Dish Identification: name, grain_starch, base, meats, vegetables, additional_ingredients, portion_size.\n\n"
-                                "Nutrition: calories, carbs, protein, fats, sodium, fiber, vitamins (vitamin_a, vitamin_c, vitamin_d), other_nutrients.\n\n"
-                                "Ensure your output is strictly valid JSON without any extra text."
-                            ),
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": f"Portion: {portion}"
-                        }
-                    ],
-                }
-            ],
+        return await routed_completion(
+            "analyze",
+            parse_verbose_food_info,
+            validate_food_info,
+            messages=[{"role": "system", "content": FOOD_INFO_SYSTEM_PROMPT}, user_message],
             temperature=0.5,
             max_completion_tokens=1024,
             top_p=1,
             frequency_penalty=0,
             presence_penalty=0,
+            extra_body={"prompt_cache_key": "analyze"},
         )
-        response_str = completion.choices[0].message.content.strip()
-        print("DEBUG: Raw GPT-4o response:", response_str)
-        output = json.loads(response_str)
-        return output
+    except UpstreamError:
+        raise
     except Exception as e:
         return {"error": f"Error in get_food_info: {str(e)}"}
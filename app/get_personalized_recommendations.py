@@ -1,41 +1,20 @@
 import os
-import json
 import datetime
-from dotenv import load_dotenv
-from openai import OpenAI
+import numpy as np
+from app.energy import energy_budgets
+from app.json_stream import JSONArrayItemParser
+from app.llm_output import parse_llm_json
+from app.logs import get_logger
+from app.model_router import get_route, routed_completion
+from app.openai_client import stream_chat_completion
+from app.recommendation_cache import personalize_cached, recommendation_cache, recommendation_cache_key, record_traffic
+from app.recommendation_engine import RECOMMENDATION_LLM_EXPLANATIONS, add_llm_explanations, rank_recommendations
+from app.resilience import UpstreamError
 
-# Load environment variables from .env
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
+# "llm" lets GPT‑4o choose the recommendations; "local" ranks dishes from the local catalog.
+RECOMMENDATION_ENGINE = os.getenv("RECOMMENDATION_ENGINE", "llm")
 
-# Instantiate the OpenAI client.
-client = OpenAI(api_key=openai_api_key)
-
-def clean_json_string(s: str) -> str:
-    """
-    Remove markdown code fences and extra characters if present.
-    """
-    s = s.strip()
-    if s.startswith("```json"):
-        s = s[len("```json"):].strip()
-    if s.startswith("```"):
-        s = s[3:].strip()
-    if s.endswith("```"):
-        s = s[:-3].strip()
-    return s
-
-def balance_braces(s: str) -> str:
-    """
-    A simple heuristic to balance curly braces by counting and appending missing "}".
-    """
-    open_braces = s.count("{")
-    close_braces = s.count("}")
-    while open_braces > close_braces:
-        s += "}"
-        close_braces += 1
-    return s
+logger = get_logger(__name__)
 
 def parse_current_time(time_str: str) -> datetime.time:
     """
@@ -66,34 +45,10 @@ def determine_meal_context(current_time: str) -> str:
     else:
         return "supper"
 
-def get_personalized_recommendations(food_totals: dict, user_profile: dict, current_time: str = None) -> dict:
+def summarize_user_profile(user_profile: dict) -> str:
     """
-    Uses GPT‑4o to generate personalized recommendations for a specific meal context based on:
-      - Nutritional totals consumed so far (calories, carbs, protein, fats, sodium).
-      - Key user profile details (age, weight, height, food-related medical conditions,
-        daily calorie target or estimated expenditure, target weight, target weight loss, steps per day).
-      - The current time, which determines the meal context.
-    
-    The prompt instructs the model to output a valid JSON object with a key "recommendations"
-    whose value is a list (of at most 5 objects). Each recommendation includes:
-      - "food": The recommended local Singaporean dish or non-food action (e.g. "Chicken Rice (with less rice)" or "Drink water and sleep early").
-      - "estimatedNutrition": An object with estimated values for calories, carbs, protein, fats, and sodium.
-      - "explanation": A detailed explanation describing why the option is recommended, including its impact on the remaining calorie budget and variant suggestions if necessary.
-      - "remainingAfter": The remaining calorie budget after consuming the recommended food.
-    
-    The prompt is tailored for the following meal contexts:
-      - Breakfast: Recommendations should leave enough calories for both lunch and dinner.
-      - Lunch: Recommendations should leave enough calories for dinner.
-      - Dinner: Use the full remaining calorie budget.
-      - Supper: Provide appropriate options if any budget remains.
+    Builds a summary of relevant user profile details (excluding name).
     """
-    # Use host system time if current_time is not provided.
-    if current_time is None:
-        current_time = datetime.datetime.now().strftime("%I:%M %p")
-    
-    meal_context = determine_meal_context(current_time)
-    
-    # Build a summary of relevant user profile details (excluding name).
     user_details = []
     if user_profile.get("age"):
         user_details.append(f"Age: {user_profile['age']}")
@@ -114,16 +69,55 @@ def get_personalized_recommendations(food_totals: dict, user_profile: dict, curr
     if user_profile.get("stepsPerDay"):
         user_details.append(f"Average Steps/Day: {user_profile['stepsPerDay']}")
     user_details_str = "; ".join(user_details)
-    
-    # Calculate remaining calorie budget.
+    return user_details_str
+
+def calculate_remaining_calories(food_totals: dict, user_profile: dict):
+    """
+    Returns the remaining calorie budget for the day. Without a daily calorie target or an
+    estimated expenditure in the profile, the budget is the TDEE estimated from age, weight,
+    height and steps per day; "unspecified" if those are missing too.
+    """
     total_cal = float(food_totals.get("calories", 0))
     if user_profile.get("dailyCalorieTarget"):
         remaining_cal = float(user_profile["dailyCalorieTarget"]) - total_cal
     elif user_profile.get("estimatedExpenditure"):
         remaining_cal = float(user_profile["estimatedExpenditure"]) - total_cal
     else:
-        remaining_cal = "unspecified"
-    
+        tdee = float(energy_budgets([user_profile], np.zeros(1))["tdee"][0])
+        remaining_cal = round(tdee) - total_cal if np.isfinite(tdee) else "unspecified"
+    return remaining_cal
+
+# Fixed instructions sent first, as the system message, so every request shares the same
+# prompt prefix and the provider can serve it from its prompt cache.
+RECOMMENDATION_SYSTEM_PROMPT = (
+    "You are a nutrition assistant for users in Singapore. "
+    "Based on the user's meal context, profile and food consumed today, provide personalized recommendations for the rest of the day to help the user reach their target. "
+    "Your answer must be tailored exclusively to common, widely available local Singaporean cuisine—recommend dishes that are easily accessible at hawker centres, food courts, or supermarkets. "
+    "Meal contexts:\n"
+    "- BREAKFAST: recommend breakfast options that leave enough calories for both lunch and dinner.\n"
+    "- LUNCH: recommend lunch options that leave enough calories for dinner.\n"
+    "- DINNER: recommend dinner options using the full remaining calorie budget.\n"
+    "- SUPPER: recommend supper options appropriate for late hours.\n"
+    "Important requirements:\n"
+    "1. Provide no more than 5 recommendations.\n"
+    "2. For each recommendation, include:\n"
+    "   - 'food': the name of the dish or non-food action (e.g. 'Chicken Rice (with less rice)' or 'Drink water and sleep early').\n"
+    "   - 'estimatedNutrition': an object with estimated values for calories, carbs, protein, fats, and sodium.\n"
+    "   - 'explanation': a detailed explanation of why this option is recommended, including its impact on the remaining calorie budget, variant suggestions (if necessary), and whether it is suitable as a full meal or a snack (e.g. ensuring breakfast leaves room for lunch and dinner).\n"
+    "   - 'remainingAfter': the remaining calorie budget after consuming this recommended food (e.g. if the remaining budget is 100 and the food uses 400 calories, this should be -300).\n"
+    "3. If the remaining calorie budget is very low or if it is late in the day (e.g., after 10:00 PM), consider recommending a light snack, a home-cooked meal, or even advise the user to drink water and get some rest instead of a full meal.\n"
+    "4. Be specific about variants. For example, if recommending Chicken Rice, suggest ordering with white rice or a reduced portion of rice if necessary.\n"
+    "Output your answer as a valid JSON object with a key 'recommendations' whose value is a list of objects as specified. "
+    "Ensure there is no additional text or markdown formatting in your output."
+)
+
+def build_recommendation_messages(current_time: str, meal_context: str, user_details_str: str,
+                                  food_totals: dict, remaining_cal) -> list:
+    """
+    Builds the GPT‑4o messages: the fixed system prompt first, then the per-request data
+    (time, meal context, user summary and consumption so far) in the user message.
+    """
+    total_cal = float(food_totals.get("calories", 0))
     # Summarize today's food consumption.
     food_totals_str = (
         f"Consumed today: Calories: {total_cal}, Carbs: {food_totals.get('carbs', 0)}g, "
@@ -131,59 +125,163 @@ def get_personalized_recommendations(food_totals: dict, user_profile: dict, curr
         f"Sodium: {food_totals.get('sodium', 0)}mg. "
         f"Remaining Calorie Budget: {remaining_cal}."
     )
-    
-    # Build the prompt with meal-specific instructions.
-    if meal_context == "breakfast":
-        meal_instruction = "You are recommending breakfast options that leave enough calories for both lunch and dinner."
-    elif meal_context == "lunch":
-        meal_instruction = "You are recommending lunch options that leave enough calories for dinner."
-    elif meal_context == "dinner":
-        meal_instruction = "You are recommending dinner options using the full remaining calorie budget."
-    else:  # supper
-        meal_instruction = "You are recommending supper options appropriate for late hours."
-    
-    prompt = (
-        f"Current time: {current_time}. Context: Singapore. "
-        f"Meal Context: {meal_context.upper()}. {meal_instruction} "
+    user_text = (
+        f"Current time: {current_time}. "
+        f"Meal Context: {meal_context.upper()}. "
         f"User Profile: {user_details_str}. {food_totals_str} "
-        f"Note that the remaining calorie budget is {remaining_cal} calories. "
-        "Based on this information, provide personalized recommendations for the rest of the day to help the user reach their target. "
-        "Your answer must be tailored exclusively to common, widely available local Singaporean cuisine—recommend dishes that are easily accessible at hawker centres, food courts, or supermarkets. "
-        "Important requirements:\n"
-        "1. Provide no more than 5 recommendations.\n"
-        "2. For each recommendation, include:\n"
-        "   - 'food': the name of the dish or non-food action (e.g. 'Chicken Rice (with less rice)' or 'Drink water and sleep early').\n"
-        "   - 'estimatedNutrition': an object with estimated values for calories, carbs, protein, fats, and sodium.\n"
-        "   - 'explanation': a detailed explanation of why this option is recommended, including its impact on the remaining calorie budget, variant suggestions (if necessary), and whether it is suitable as a full meal or a snack (e.g. ensuring breakfast leaves room for lunch and dinner).\n"
-        "   - 'remainingAfter': the remaining calorie budget after consuming this recommended food (e.g. if the remaining budget is 100 and the food uses 400 calories, this should be -300).\n"
-        "3. If the remaining calorie budget is very low or if it is late in the day (e.g., after 10:00 PM), consider recommending a light snack, a home-cooked meal, or even advise the user to drink water and get some rest instead of a full meal.\n"
-        "4. Be specific about variants. For example, if recommending Chicken Rice, suggest ordering with white rice or a reduced portion of rice if necessary.\n"
-        "Output your answer as a valid JSON object with a key 'recommendations' whose value is a list of objects as specified. "
-        "Ensure there is no additional text or markdown formatting in your output."
+        f"Note that the remaining calorie budget is {remaining_cal} calories."
     )
+    return [
+        {"role": "system", "content": RECOMMENDATION_SYSTEM_PROMPT},
+        {"role": "user", "content": [{"type": "text", "text": user_text}]},
+    ]
+
+# Sampling parameters shared by the buffered and streaming recommendation calls.
+RECOMMENDATION_COMPLETION_PARAMS = {
+    "temperature": 0.7,
+    "max_completion_tokens": 1024,
+    "top_p": 1,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+    # Sent as a raw body field so SDK versions without a prompt_cache_key argument still work.
+    "extra_body": {"prompt_cache_key": "recommend"},
+}
+
+def parse_recommendations(completion) -> dict:
+    """
+    Parses a recommendations completion, raising if any item is missing its food name or
+    numeric nutrition estimates so the router escalates to the next model tier.
+    """
+    # Strips markdown fences; truncated output raises instead of being patched up.
+    output = parse_llm_json(completion.choices[0].message.content)
+    recommendations = output["recommendations"]
+    if not isinstance(recommendations, list) or not recommendations:
+        raise ValueError("No recommendations returned")
+    for item in recommendations:
+        if not isinstance(item.get("food"), str) or not item["food"].strip():
+            raise ValueError(f"Recommendation without a food: {item!r}")
+        for nutrient in ("calories", "carbs", "protein", "fats", "sodium"):
+            if not isinstance(item["estimatedNutrition"].get(nutrient), (int, float)):
+                raise ValueError(f"Recommendation without numeric {nutrient}: {item['food']}")
+    return output
+
+async def get_personalized_recommendations(food_totals: dict, user_profile: dict, current_time: str = None,
+                                           track_traffic: bool = True) -> dict:
+    """
+    Uses GPT‑4o to generate personalized recommendations for a specific meal context based on:
+      - Nutritional totals consumed so far (calories, carbs, protein, fats, sodium).
+      - Key user profile details (age, weight, height, food-related medical conditions,
+        daily calorie target or estimated expenditure, target weight, target weight loss, steps per day).
+      - The current time, which determines the meal context.
+    
+    The prompt instructs the model to output a valid JSON object with a key "recommendations"
+    whose value is a list (of at most 5 objects). Each recommendation includes:
+      - "food": The recommended local Singaporean dish or non-food action (e.g. "Chicken Rice (with less rice)" or "Drink water and sleep early").
+      - "estimatedNutrition": An object with estimated values for calories, carbs, protein, fats, and sodium.
+      - "explanation": A detailed explanation describing why the option is recommended, including its impact on the remaining calorie budget and variant suggestions if necessary.
+      - "remainingAfter": The remaining calorie budget after consuming the recommended food.
+    
+    The prompt is tailored for the following meal contexts:
+      - Breakfast: Recommendations should leave enough calories for both lunch and dinner.
+      - Lunch: Recommendations should leave enough calories for dinner.
+      - Dinner: Use the full remaining calorie budget.
+      - Supper: Provide appropriate options if any budget remains.
+
+    Requests are counted per cache key for pre-warming unless track_traffic is False.
+    Upstream timeouts and outages raise UpstreamError; other failures return {"error": ...}.
+    """
+    # Use host system time if current_time is not provided.
+    if current_time is None:
+        current_time = datetime.datetime.now().strftime("%I:%M %p")
     
-    print("DEBUG: current_time:", current_time)
-    print("DEBUG: meal_context:", meal_context)
-    print("DEBUG: user_details_str:", user_details_str)
-    print("DEBUG: food_totals_str:", food_totals_str)
+    meal_context = determine_meal_context(current_time)
+    user_details_str = summarize_user_profile(user_profile)
+    remaining_cal = calculate_remaining_calories(food_totals, user_profile)
+
+    if RECOMMENDATION_ENGINE == "local":
+        output = rank_recommendations(food_totals, user_profile, meal_context, remaining_cal)
+        if RECOMMENDATION_LLM_EXPLANATIONS:
+            output = await add_llm_explanations(output, meal_context, user_details_str)
+        return output
+
+    # Users in the same situation share recommendations; a hit skips GPT‑4o entirely.
+    cache_key = recommendation_cache_key(user_profile, meal_context, remaining_cal)
+    if track_traffic:
+        record_traffic(cache_key, food_totals, user_profile)
+    cached = recommendation_cache.get(cache_key)
+    if cached is not None:
+        return personalize_cached(cached, remaining_cal)
+
+    messages = build_recommendation_messages(current_time, meal_context, user_details_str, food_totals, remaining_cal)
+    
+    logger.debug("current_time=%s meal_context=%s user_details=%s", current_time, meal_context, user_details_str)
 
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-            temperature=0.7,
-            max_completion_tokens=1024,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0,
+        output = await routed_completion(
+            "recommend",
+            parse_recommendations,
+            messages=messages,
+            **RECOMMENDATION_COMPLETION_PARAMS,
         )
-        response_str = completion.choices[0].message.content.strip()
-        # Clean the response string to remove markdown fences.
-        response_str = clean_json_string(response_str)
-        # Heuristically balance braces if needed.
-        response_str = balance_braces(response_str)
-        # print("DEBUG: Cleaned GPT-4o response:", response_str)
-        output = json.loads(response_str)
+        recommendation_cache.set(cache_key, output)
         return output
+    except UpstreamError:
+        raise
     except Exception as e:
         return {"error": f"Error generating personalized recommendations: {str(e)}"}
+
+async def stream_personalized_recommendations(food_totals: dict, user_profile: dict, current_time: str = None):
+    """
+    Streaming variant of get_personalized_recommendations.
+    Yields each recommendation as soon as GPT‑4o has finished writing it, so the first one
+    arrives after roughly one item's worth of generation. A recommendation cut off by the
+    end of the stream is dropped. Cached and locally ranked results are yielded directly.
+    Errors are yielded as a final {"error": ...} item.
+    Items already sent cannot be taken back, so instead of escalating, streaming uses the
+    last (strongest) model of the "recommend_stream" route.
+    """
+    if current_time is None:
+        current_time = datetime.datetime.now().strftime("%I:%M %p")
+
+    meal_context = determine_meal_context(current_time)
+    user_details_str = summarize_user_profile(user_profile)
+    remaining_cal = calculate_remaining_calories(food_totals, user_profile)
+
+    if RECOMMENDATION_ENGINE == "local":
+        output = rank_recommendations(food_totals, user_profile, meal_context, remaining_cal)
+        if RECOMMENDATION_LLM_EXPLANATIONS:
+            output = await add_llm_explanations(output, meal_context, user_details_str)
+        for item in output["recommendations"]:
+            yield item
+        return
+
+    cache_key = recommendation_cache_key(user_profile, meal_context, remaining_cal)
+    record_traffic(cache_key, food_totals, user_profile)
+    cached = recommendation_cache.get(cache_key)
+    if cached is not None:
+        for item in personalize_cached(cached, remaining_cal).get("recommendations", []):
+            yield item
+        return
+
+    messages = build_recommendation_messages(current_time, meal_context, user_details_str, food_totals, remaining_cal)
+    parser = JSONArrayItemParser("recommendations")
+    recommendations = []
+    try:
+        async for text in stream_chat_completion(
+            endpoint="recommend_stream",
+            model=get_route("recommend_stream")[-1],
+            messages=messages,
+            **RECOMMENDATION_COMPLETION_PARAMS,
+        ):
+            for item in parser.feed(text):
+                recommendations.append(item)
+                yield item
+    except UpstreamError as e:
+        yield {"error": str(e), "status": e.status_code}
+        return
+    except Exception as e:
+        yield {"error": f"Error generating personalized recommendations: {str(e)}"}
+        return
+    if parser.done:
+        # Only a complete array is cached; a truncated stream may be missing items.
+        recommendation_cache.set(cache_key, {"recommendations": recommendations})
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import statistics
+from PIL import Image
+from app.cache import LRUTTLCache
+
+# Images whose perceptual hashes differ in at most this many bits, and whose mean colors
+# differ by at most IMAGE_CACHE_MAX_COLOR_DISTANCE in every channel, are treated as the same dish.
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "3"))
+IMAGE_CACHE_MAX_COLOR_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_COLOR_DISTANCE", "16"))
+# Images whose 9x8 grayscale thumbnail has a lower standard deviation are neither cached nor
+# looked up: without texture the hash is close to 0 whatever the photo shows.
+IMAGE_CACHE_MIN_CONTRAST = float(os.getenv("IMAGE_CACHE_MIN_CONTRAST", "8"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "1024"))
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", str(7 * 24 * 3600)))
+# Optional SQLite file for a cache tier that survives restarts; empty keeps the cache in memory only.
+IMAGE_CACHE_DB = os.getenv("IMAGE_CACHE_DB", "")
+
+def image_hash(image: Image.Image):
+    """
+    Returns the cache key of an image: (dHash, mean color), or None for flat, low-contrast
+    images, which are not cached.
+    The image is reduced to 9x8 pixels. Each of the 64 dHash bits records whether a grayscale
+    pixel is brighter than its right neighbour, so resizing and re-compression barely change
+    it; the mean color, packed as 0xRRGGBB, tells apart dishes of the same layout.
+    """
+    thumbnail = image.convert("RGB").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(thumbnail.convert("L").tobytes())
+    if statistics.pstdev(pixels) < IMAGE_CACHE_MIN_CONTRAST:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    rgb = thumbnail.tobytes()
+    red, green, blue = (round(sum(rgb[channel::3]) / len(pixels)) for channel in range(3))
+    return value, (red << 16) | (green << 8) | blue
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def color_distance(a: int, b: int) -> int:
+    """
+    Largest difference between two packed 0xRRGGBB colors in any one channel.
+    """
+    return max(abs(((a >> shift) & 0xFF) - ((b >> shift) & 0xFF)) for shift in (16, 8, 0))
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit.
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+class PerceptualImageCache:
+    """
+    Caches food analysis results by image_hash key, matching any cached image within
+    max_distance bits and max_color_distance per color channel. None keys (flat images)
+    are never cached or matched. Entries live in an LRU/TTL memory tier, which is the only one
+    searched. When db_path is set, entries are also written to SQLite so the memory tier can
+    be reloaded after a restart. Every PRUNE_EVERY inserts, and at startup, the file is
+    pruned to unexpired rows and the newest maxsize of them, since more could not be loaded.
+    """
+
+    # Inserts between two prunes of the SQLite file.
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_distance: int = IMAGE_CACHE_MAX_DISTANCE, maxsize: int = IMAGE_CACHE_SIZE,
+                 ttl: float = IMAGE_CACHE_TTL, db_path: str = IMAGE_CACHE_DB,
+                 max_color_distance: int = IMAGE_CACHE_MAX_COLOR_DISTANCE):
+        self.max_distance = max_distance
+        self.max_color_distance = max_color_distance
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.memory = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.db = None
+        self._db_lock = threading.Lock()
+        self._inserts = 0
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            # Rows of the earlier grayscale-only table cannot be told apart by color.
+            self.db.execute("DROP TABLE IF EXISTS food_info")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS image_analyses "
+                "(phash INTEGER, color INTEGER, result TEXT, created REAL, PRIMARY KEY (phash, color))"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS image_analyses_created ON image_analyses (created)")
+            self.prune()
+            self.load()
+
+    def load(self) -> None:
+        """
+        Fills the memory tier from SQLite, oldest first so the newest entries are most recently used.
+        """
+        with self._db_lock:
+            rows = self.db.execute(
+                "SELECT phash, color, result, created FROM image_analyses ORDER BY created DESC LIMIT ?",
+                (self.maxsize,),
+            ).fetchall()
+        for phash, color, result, created in reversed(rows):
+            self.memory.set((phash & (2**64 - 1), color), json.loads(result), created=created)
+
+    def prune(self) -> None:
+        """
+        Deletes expired rows and all but the newest maxsize rows from SQLite.
+        """
+        with self._db_lock:
+            self.db.execute("DELETE FROM image_analyses WHERE created < ?", (time.time() - self.ttl,))
+            self.db.execute(
+                "DELETE FROM image_analyses WHERE rowid IN "
+                "(SELECT rowid FROM image_analyses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+            self.db.commit()
+
+    def get(self, key):
+        """
+        Returns the cached result for the nearest matching image, or None.
+        """
+        if key is None:
+            return None
+        result = self.memory.get(key)
+        if result is not None:
+            return result
+        phash, color = key
+        best_key, best_distance = None, self.max_distance + 1
+        for other in self.memory.keys():
+            if color_distance(color, other[1]) > self.max_color_distance:
+                continue
+            distance = hamming_distance(phash, other[0])
+            if distance < best_distance:
+                best_key, best_distance = other, distance
+        if best_key is not None:
+            return self.memory.get(best_key)
+        return None
+
+    def set(self, key, result: dict):
+        if key is None:
+            return
+        created = time.time()
+        self.memory.set(key, result, created=created)
+        if self.db is not None:
+            phash, color = key
+            with self._db_lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO image_analyses (phash, color, result, created) VALUES (?, ?, ?, ?)",
+                    (_to_signed(phash), color, json.dumps(result), created),
+                )
+                self.db.commit()
+                self._inserts += 1
+                prune = self._inserts % self.PRUNE_EVERY == 0
+            if prune:
+                self.prune()
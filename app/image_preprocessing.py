@@ -0,0 +1,45 @@
+import io
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from app.image_cache import image_hash
+
+# Longest edge, in pixels, that images are downscaled to before being sent upstream.
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Vision detail level: "low", "high", or "auto" to use "low" when the image fits in a single 512px tile.
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "auto")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads run in parallel.
+_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+def choose_detail(width: int, height: int, detail: str = IMAGE_DETAIL) -> str:
+    if detail != "auto":
+        return detail
+    return "low" if max(width, height) <= 512 else "high"
+
+def preprocess_image(image_bytes: bytes, max_edge: int = IMAGE_MAX_EDGE, quality: int = IMAGE_JPEG_QUALITY,
+                     detail: str = IMAGE_DETAIL) -> tuple:
+    """
+    Prepares an uploaded image for the vision model.
+    Applies the EXIF orientation, downscales so the longest edge is at most max_edge,
+    and re-encodes as RGB JPEG at the given quality.
+    Returns (jpeg_bytes, detail, perceptual_hash).
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Let the JPEG decoder skip straight to a nearby scale instead of decoding every pixel.
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), choose_detail(image.width, image.height, detail), image_hash(image)
+
+async def prepare_image(image_bytes: bytes) -> tuple:
+    """
+    Runs preprocess_image on the image worker pool, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, preprocess_image, image_bytes)
@@ -1,37 +1,38 @@
-import os
-import base64
-from dotenv import load_dotenv
-from openai import OpenAI
-import json
+from app.llm_output import parse_llm_json
+from app.model_router import check_dish_name, check_nutrition, routed_completion
+from app.nutrition_index import nutrition_index
 
-# Load environment variables from .env
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
 
-# Instantiate the OpenAI client for API calls.
-client = OpenAI(api_key=openai_api_key)
+def parse_dish(completion) -> dict:
+    """
+    Parses a dish identification, raising if it is malformed.
+    """
+    return parse_llm_json(completion.choices[0].message.content)
+
+
+def validate_dish(output: dict) -> None:
+    check_dish_name(output["name"])
 
 
-def encode_image(image_path: str) -> str:
+def parse_nutrition(completion) -> dict:
     """
-    Encodes an image to Base64 format.
+    Parses analyze_nutrients arguments, raising if they are malformed.
     """
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    return parse_llm_json(completion.choices[0].message.tool_calls[0].function.arguments)
 
 
-def identify_food_from_image(image_path: str) -> dict:
+async def identify_food_from_image(image_base64: str) -> dict:
     """
-    Identifies the food dish in an image using GPT‑4o.
+    Identifies the food dish in a Base64-encoded JPEG, escalating along the "identify" model route.
+    Encode uploaded bytes with app.uploads.encode_image_bytes.
     The model is instructed to output a valid JSON object with keys:
       name, grain_starch, base, meats, vegetables, additional_ingredients, portion_size.
     """
-    image_base64 = encode_image(image_path)
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
+        return await routed_completion(
+            "identify",
+            parse_dish,
+            validate_dish,
             messages=[
                 {
                     "role": "user",
@@ -56,22 +57,25 @@ def identify_food_from_image(image_path: str) -> dict:
                 }
             ],
         )
-        dish_str = completion.choices[0].message.content.strip()
-        output = json.loads(dish_str)
-        return output
     except Exception as e:
         return {"error": f"Error identifying food: {str(e)}"}
 
 
-def get_nutrition_info_gpt4o(dish: str, portion: float = 1.0) -> dict:
+async def get_nutrition_info_gpt4o(dish: str, portion: float = 1.0) -> dict:
     """
-    Retrieves nutritional information for the given dish using GPT‑4o.
+    Retrieves nutritional information for the given dish, escalating along the "nutrition" model route.
     The prompt instructs the model to output valid JSON.
     The JSON output now includes a "sodium" key (total sodium in milligrams).
+    Dishes found in the local nutrition table are answered from it without calling a model.
     """
+    local = nutrition_index.lookup(dish, portion)
+    if local is not None:
+        return local
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        return await routed_completion(
+            "nutrition",
+            parse_nutrition,
+            check_nutrition,
             messages=[
                 {
                     "role": "system",
@@ -180,8 +184,5 @@ def get_nutrition_info_gpt4o(dish: str, portion: float = 1.0) -> dict:
             frequency_penalty=0,
             presence_penalty=0,
         )
-        json_output = response.choices[0].message.tool_calls[0].function.arguments
-        output = json.loads(json_output)
-        return output
     except Exception as e:
         return {"error": f"Error retrieving nutritional info: {str(e)}"}
@@ -0,0 +1,174 @@
+import os
+import time
+import uuid
+import asyncio
+from fastapi import HTTPException
+from app.cache import LRUTTLCache
+from app.logs import get_logger
+from app.metrics import Counter, Gauge
+from app.resilience import UpstreamError
+
+logger = get_logger(__name__)
+
+# Jobs run at once, independent of how many HTTP requests the server handles; each one
+# holds an upstream call, so there is little point in exceeding UPSTREAM_CONCURRENCY.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+# Jobs waiting for a worker; submissions beyond it are refused with 503.
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "256"))
+# How long a job and its result can be fetched after it was submitted or finished.
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "900"))
+JOB_STORE_SIZE = int(os.getenv("JOB_STORE_SIZE", "10000"))
+# Longest a poll may wait for a job to finish.
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+jobs_queued = Gauge("jobs_queued", "Jobs waiting for a worker.")
+jobs_running = Gauge("jobs_running", "Jobs being run by a worker.")
+jobs_finished = Counter("jobs_total", "Finished jobs by outcome.", ("outcome",))
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while JOB_QUEUE_DEPTH jobs are already waiting.
+    """
+
+class Job:
+    """
+    One unit of background work. status moves from "queued" to "running" to "done" or "failed";
+    a done job holds the work's result, a failed one its error message and HTTP status.
+    """
+
+    def __init__(self, key: str, fn):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.submitted = time.time()
+        self.finished = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        output = {"job_id": self.id, "status": self.status}
+        if self.status == "done":
+            output["result"] = self.result
+        elif self.status == "failed":
+            output["error"] = self.error
+            output["error_status"] = self.status_code
+        return output
+
+class JobQueue:
+    """
+    Runs submitted coroutines on a fixed pool of workers and keeps finished jobs for
+    result_ttl seconds. Jobs are deduplicated by key: submitting a key whose job is queued,
+    running or done returns that job instead of running the work again. Failed jobs are
+    not reused, so resubmitting retries them.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_depth: int = JOB_QUEUE_DEPTH,
+                 result_ttl: float = JOB_RESULT_TTL, store_size: int = JOB_STORE_SIZE):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.jobs = LRUTTLCache(maxsize=store_size, ttl=result_ttl)
+        self.by_key = LRUTTLCache(maxsize=store_size, ttl=result_ttl)
+        self.running = 0
+        self.totals = {"submitted": 0, "deduplicated": 0, "done": 0, "failed": 0}
+        self._queue = None
+        self._tasks = []
+
+    def find(self, key: str):
+        """
+        Returns the live job for key, or None if there is none or it failed.
+        """
+        job_id = self.by_key.get(key)
+        job = self.jobs.get(job_id) if job_id is not None else None
+        if job is None or job.status == "failed":
+            return None
+        self.totals["deduplicated"] += 1
+        return job
+
+    def submit(self, key: str, fn) -> Job:
+        """
+        Queues await fn() under key and returns its job, or the existing job for key.
+        Raises QueueFull when the queue is at capacity.
+        """
+        job = self.find(key)
+        if job is not None:
+            return job
+        self.start()
+        if self._queue.qsize() >= self.queue_depth:
+            raise QueueFull()
+        job = Job(key, fn)
+        self.jobs.set(job.id, job)
+        self.by_key.set(key, job.id)
+        self._queue.put_nowait(job)
+        self.totals["submitted"] += 1
+        jobs_queued.set(self._queue.qsize())
+        return job
+
+    async def wait(self, job_id: str, timeout: float = 0):
+        """
+        Returns the job, after waiting up to timeout seconds (capped at JOB_MAX_WAIT) for it
+        to finish, or None if it is unknown or expired.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        timeout = min(timeout, JOB_MAX_WAIT)
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def start(self) -> None:
+        """
+        Starts the workers on the running event loop, if they are not running yet.
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            jobs_queued.set(self._queue.qsize())
+            self.running += 1
+            jobs_running.set(self.running)
+            job.status = "running"
+            try:
+                job.result = await job.fn()
+                job.status = "done"
+            except HTTPException as e:
+                job.status, job.error, job.status_code = "failed", e.detail, e.status_code
+            except UpstreamError as e:
+                job.status, job.error, job.status_code = "failed", str(e), e.status_code
+            except Exception as e:
+                logger.exception("Job %s failed", job.id)
+                job.status, job.error, job.status_code = "failed", str(e), 500
+            finally:
+                self.running -= 1
+                jobs_running.set(self.running)
+            job.fn = None
+            job.finished = time.time()
+            # Restart the TTL so the result stays available for result_ttl after it is ready.
+            self.jobs.set(job.id, job)
+            self.by_key.set(job.key, job.id)
+            self.totals[job.status] += 1
+            jobs_finished.inc(outcome=job.status)
+            job.done.set()
+
+    def stats(self) -> dict:
+        return {
+            **self.totals,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+        }
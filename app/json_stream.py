@@ -0,0 +1,84 @@
+import json
+from app.llm_output import loads
+
+class JSONArrayItemParser:
+    """
+    Incrementally extracts the object (or array) elements of one array in a JSON document
+    that arrives in pieces.
+
+    Text is fed as it streams in. Once the array under `key` has been opened, every element
+    that has fully closed is decoded and returned by feed(). Anything before the key (such as
+    a markdown code fence) is skipped, and an element still open when the stream ends is
+    simply never returned, so truncated output drops the partial item instead of guessing.
+    """
+
+    def __init__(self, key: str):
+        self.marker = json.dumps(key)
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+
+    def feed(self, text: str) -> list:
+        """
+        Adds streamed text and returns the array elements completed by it.
+        """
+        self.buffer += text
+        items = []
+        if self.done:
+            return items
+        if not self.in_array and not self._find_array():
+            return items
+        buffer = self.buffer
+        pos = self.pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if self.depth == 0:
+                    self.item_start = pos
+                self.depth += 1
+            elif char in "}]":
+                if self.depth == 0:
+                    # The array itself has closed.
+                    self.done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0:
+                    items.append(loads(buffer[self.item_start:pos + 1]))
+                    self.item_start = None
+            pos += 1
+        # Drop text that can no longer be part of a pending element.
+        keep_from = self.item_start if self.item_start is not None else pos
+        self.buffer = buffer[keep_from:]
+        if self.item_start is not None:
+            self.item_start = 0
+        self.pos = pos - keep_from
+        return items
+
+    def _find_array(self) -> bool:
+        """
+        Advances past the key and its opening bracket once both have arrived.
+        """
+        key_at = self.buffer.find(self.marker)
+        if key_at < 0:
+            return False
+        bracket_at = self.buffer.find("[", key_at + len(self.marker))
+        if bracket_at < 0:
+            return False
+        self.in_array = True
+        self.buffer = self.buffer[bracket_at + 1:]
+        self.pos = 0
+        return True
@@ -0,0 +1,140 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library.
+    orjson = None
+
+# Longest excerpt of the raw model output quoted in error messages.
+EXCERPT_CHARS = 200
+
+class LLMOutputError(ValueError):
+    """
+    Raised when model output cannot be turned into the expected JSON value.
+    """
+
+    def __init__(self, message: str, raw: str = ""):
+        self.raw = raw
+        excerpt = raw[:EXCERPT_CHARS] + ("..." if len(raw) > EXCERPT_CHARS else "")
+        super().__init__(f"{message}: {excerpt!r}" if raw else message)
+
+class LLMOutputEmptyError(LLMOutputError):
+    """
+    The model returned no content.
+    """
+
+class LLMOutputTruncatedError(LLMOutputError):
+    """
+    The JSON ends before all of its objects and arrays are closed, usually because the
+    completion hit its token limit.
+    """
+
+class LLMOutputDecodeError(LLMOutputError):
+    """
+    The output is complete but not valid JSON.
+    """
+
+def loads(data):
+    """
+    Decodes JSON text or bytes with orjson when it is installed, else with the json module.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+_decoder = json.JSONDecoder()
+
+def _json_start(text: str, begin: int = 0) -> int:
+    return min((i for i in (text.find("{", begin), text.find("[", begin)) if i >= 0), default=-1)
+
+def _json_body(text: str) -> tuple:
+    """
+    Returns (body, start): the contents of the first markdown code fence if one opens before
+    the JSON, else the stripped text, and the index of the first "{" or "[" in it (-1 if none).
+    """
+    text = text.strip()
+    start = _json_start(text)
+    fence = text.find("```")
+    if fence >= 0 and (start < 0 or fence < start):
+        # Keep what is between the opening fence and the closing fence, if there is one.
+        body_end = text.find("```", fence + 3)
+        text = text[fence + 3:body_end if body_end >= 0 else len(text)]
+        start = _json_start(text)
+    return text, start
+
+def extract_json_text(text: str) -> str:
+    """
+    Returns the JSON part of model output: the contents of the first markdown code fence if
+    one opens before the JSON, then the text from the first "{" or "[" to the last "}" or "]".
+    """
+    text, start = _json_body(text)
+    if start < 0:
+        return text.strip()
+    end = max(text.rfind("}"), text.rfind("]"))
+    return text[start:end + 1] if end > start else text[start:]
+
+def decode_embedded_json(text: str):
+    """
+    Returns the longest JSON object or array embedded in text, so bracketed prose before or
+    after the answer ("Sure [note]: {...}", "{...} see [1]") is skipped. Openers inside a
+    value already decoded are not retried. Raises ValueError if no "{" or "[" starts valid JSON.
+    """
+    best = None
+    best_length = 0
+    start = _json_start(text)
+    while start >= 0:
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except ValueError:
+            start = _json_start(text, start + 1)
+            continue
+        if end - start > best_length:
+            best, best_length = value, end - start
+        start = _json_start(text, end)
+    if not best_length:
+        raise ValueError("No JSON object or array found")
+    return best
+
+def _is_unclosed(text: str) -> bool:
+    depth = 0
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+    return depth > 0 or in_string
+
+def parse_llm_json(text):
+    """
+    Parses JSON produced by the model, tolerating surrounding code fences or prose.
+    Raises LLMOutputEmptyError, LLMOutputTruncatedError or LLMOutputDecodeError.
+    """
+    if text is None or not text.strip():
+        raise LLMOutputEmptyError("Model returned no content")
+    candidate = extract_json_text(text)
+    try:
+        return loads(candidate)
+    except ValueError:
+        pass
+    # Brackets in the surrounding prose make the candidate span more than the JSON.
+    try:
+        return decode_embedded_json(candidate)
+    except ValueError:
+        pass
+    # Checked up to the end of the output: cutting at the last closer would end the text at a
+    # bracket from prose such as "[note]" when the JSON after it was cut off.
+    body, start = _json_body(text)
+    if start >= 0 and _is_unclosed(body[start:]):
+        raise LLMOutputTruncatedError("Model output ends before the JSON is complete", text)
+    raise LLMOutputDecodeError("Model output is not valid JSON", text)
@@ -0,0 +1,38 @@
+import os
+import random
+import logging
+
+# Level for the app's loggers; DEBUG records are only created when this is DEBUG.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of DEBUG records actually written, so debug logging stays affordable under load.
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+class SampledDebugFilter(logging.Filter):
+    """
+    Passes every record above DEBUG and a random sample_rate share of DEBUG records.
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.sample_rate
+
+def _configure() -> logging.Logger:
+    root = logging.getLogger("app")
+    root.setLevel(LOG_LEVEL)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    handler.addFilter(SampledDebugFilter(LOG_DEBUG_SAMPLE_RATE))
+    root.addHandler(handler)
+    root.propagate = False
+    return root
+
+_root = _configure()
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger under the "app" hierarchy, which shares its level and sampled handler.
+    """
+    return logging.getLogger(name)
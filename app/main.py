@@ -1,41 +1,67 @@
 import os
-import uuid
-import shutil
 import json
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body
-from fastapi.responses import JSONResponse
+import math
+import asyncio
+import hashlib
+from typing import Any, List
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.formparsers import MultiPartParser
+from app.admission import AdmissionMiddleware
+from app.cohort import COHORT_MAX_USERS, cohort_recommendations
 from app.get_food_info import get_food_info
-from app.get_personalized_recommendations import get_personalized_recommendations
-
-# ----- Monkey-patch json.loads to clean markdown formatting -----
-original_json_loads = json.loads
-
-def clean_json_string(s: str) -> str:
-    s = s.strip()
-    if s.startswith("```json"):
-        s = s[len("```json"):].strip()
-    if s.startswith("```"):
-        s = s[3:].strip()
-    if s.endswith("```"):
-        s = s[:-3].strip()
-    return s
-
-def debug_json_loads(s):
-    if isinstance(s, bytes):
-        s = s.decode("utf-8")
-    s_clean = clean_json_string(s)
-    try:
-        return original_json_loads(s_clean)
-    except Exception as e:
-        print("Debug: Failed to parse JSON. Raw response:")
-        print(s)
-        raise e
+from app.get_personalized_recommendations import get_personalized_recommendations, stream_personalized_recommendations
+from app.image_cache import PerceptualImageCache
+from app.image_preprocessing import prepare_image
+from app.jobs import JobQueue, QueueFull
+from app.metrics import MetricsMiddleware, render_metrics, time_stage
+from app.model_router import router_stats
+from app.prewarm import prewarm_stats, start_prewarm_scheduler
+from app.resilience import UpstreamError, circuit_stats
+from app.responses import FastJSONResponse, dumps
+from app.singleflight import SingleFlight
+from app.usage import usage_stats
+from app.uploads import MAX_UPLOAD_BYTES, MaxBodySizeMiddleware, encode_image_bytes, read_upload
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warms the recommendation cache in the background ahead of each meal window.
+    prewarm_task = start_prewarm_scheduler()
+    yield
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    await analyze_jobs.stop()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
-json.loads = debug_json_loads
-# --------------------------------------------------------------------
+# Images per /analyze/batch request and how many of them are analyzed at once.
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "6"))
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "6"))
 
-app = FastAPI()
+# Largest request body per upload path. The allowance on top of MAX_UPLOAD_BYTES covers
+# the multipart envelope.
+UPLOAD_BODY_LIMITS = {
+    "/analyze": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/analyze/jobs": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/analyze/batch": MAX_BATCH_FILES * (MAX_UPLOAD_BYTES + 64 * 1024),
+}
+
+# Keep uploaded files in memory: Starlette spools parts larger than spool_max_size to a
+# temporary file, and no part can be larger than the body limit of its path.
+MultiPartParser.spool_max_size = max(UPLOAD_BODY_LIMITS.values())
+
+# Rate-limit clients and bound the queue in front of the endpoints that call the model,
+# so overload is answered with 429/503 and Retry-After instead of ever-growing latency.
+app.add_middleware(
+    AdmissionMiddleware,
+    paths={"/analyze", "/analyze/batch", "/analyze/jobs", "/recommend", "/recommend/stream", "/recommend/cohort"},
+)
+
+# Reject oversized uploads from their Content-Length, or as soon as a chunked body
+# passes the limit, before the body is parsed.
+app.add_middleware(MaxBodySizeMiddleware, limits=UPLOAD_BODY_LIMITS)
 
 origins = [
     "http://localhost:3000",
@@ -48,25 +74,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "Retry-After"],
 )
 
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+# Added last so it is outermost and times every request, including rejected ones.
+app.add_middleware(MetricsMiddleware, routes=app.routes)
 
-@app.post("/analyze")
-async def analyze_food(file: UploadFile = File(...)):
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError):
+    """
+    Reports upstream timeouts as 504 and outages as 503 (with Retry-After while the
+    circuit is open) instead of a generic 500.
+    """
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return FastJSONResponse(content={"detail": str(exc)}, status_code=exc.status_code, headers=headers)
+
+image_cache = PerceptualImageCache()
+
+# Identical requests already in flight (retries, double taps) share one upstream call.
+analyze_flight = SingleFlight()
+recommend_flight = SingleFlight()
+
+# Background analyses submitted through /analyze/jobs, deduplicated by upload hash.
+analyze_jobs = JobQueue()
+
+async def read_image_upload(file: UploadFile) -> tuple:
+    """
+    Validates the type of an uploaded image and reads it.
+    Returns (image_bytes, sha256 hex digest) and raises HTTPException on failure.
+    """
     if file.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(status_code=400, detail="Invalid image type. Only JPEG and PNG are allowed.")
-    file_id = str(uuid.uuid4())
-    file_extension = file.filename.split(".")[-1]
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}.{file_extension}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    food_info = get_food_info(file_path)
-    os.remove(file_path)
-    if "error" in food_info:
-        raise HTTPException(status_code=500, detail=food_info["error"])
+    with time_stage("upload_read"):
+        image_bytes = await read_upload(file)
+    return image_bytes, hashlib.sha256(image_bytes).hexdigest()
+
+async def analyze_upload(file: UploadFile) -> tuple:
+    """
+    Validates, preprocesses and analyzes one uploaded image.
+    Returns (output, cache_status) and raises HTTPException on failure.
+    """
+    image_bytes, key = await read_image_upload(file)
+    return await analyze_flight.do(key, lambda: analyze_image(image_bytes))
+
+async def preprocess_image(image_bytes: bytes) -> tuple:
+    try:
+        with time_stage("image_preprocess"):
+            return await prepare_image(image_bytes)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not decode the uploaded image.")
+
+async def analyze_image(image_bytes: bytes) -> tuple:
+    return await analyze_prepared(*await preprocess_image(image_bytes))
+
+async def analyze_prepared(image_bytes: bytes, detail: str, phash) -> tuple:
+    # Photos of the same dish hash to nearby values, so reuse an earlier analysis when one is close enough.
+    food_info = await asyncio.to_thread(image_cache.get, phash)
+    cache_status = "HIT"
+    if food_info is None:
+        cache_status = "MISS"
+        with time_stage("image_encode"):
+            image_base64 = encode_image_bytes(image_bytes)
+        food_info = await get_food_info(image_base64, detail=detail)
+        if "error" in food_info:
+            raise HTTPException(status_code=500, detail=food_info["error"])
+        await asyncio.to_thread(image_cache.set, phash, food_info)
     output = {
         "name": food_info.get("Dish Identification", {}).get("name"),
         "calories": food_info.get("Nutrition", {}).get("calories"),
@@ -75,7 +149,86 @@ async def analyze_food(file: UploadFile = File(...)):
         "fats": food_info.get("Nutrition", {}).get("fats"),
         "sodium": food_info.get("Nutrition", {}).get("sodium")
     }
-    return JSONResponse(content=output)
+    return output, cache_status
+
+@app.post("/analyze")
+async def analyze_food(file: UploadFile = File(...)):
+    output, cache_status = await analyze_upload(file)
+    return FastJSONResponse(content=output, headers={"X-Cache": cache_status})
+
+@app.post("/analyze/jobs", status_code=202)
+async def submit_analyze_job(file: UploadFile = File(...)):
+    """
+    Queues an image for analysis and returns its job id at once, so the client need not hold
+    the connection open during the upstream call. Submitting the same image again while its
+    job is pending or its result is kept returns the same job.
+    """
+    image_bytes, key = await read_image_upload(file)
+    job = analyze_jobs.find(key)
+    if job is None:
+        # Decode and downscale now, so undecodable uploads are refused here and only the
+        # small preprocessed image waits in the queue.
+        prepared = await preprocess_image(image_bytes)
+        try:
+            job = analyze_jobs.submit(key, lambda: analyze_flight.do(key, lambda: analyze_prepared(*prepared)))
+        except QueueFull:
+            raise HTTPException(status_code=503, detail="Too many queued analyses, try again later.",
+                                headers={"Retry-After": "5"})
+    return FastJSONResponse(content=job_view(job), status_code=202)
+
+@app.get("/analyze/jobs/{job_id}")
+async def get_analyze_job(job_id: str, wait: float = Query(0, ge=0)):
+    """
+    Returns the job's status, and its result once done. With wait, holds the request for up to
+    that many seconds (at most JOB_MAX_WAIT) until the job finishes.
+    """
+    job = await analyze_jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return FastJSONResponse(content=job_view(job))
+
+def job_view(job) -> dict:
+    output = job.to_dict()
+    if job.status == "done":
+        result, cache_status = job.result
+        output["result"] = result
+        output["cache"] = cache_status
+    return output
+
+@app.post("/analyze/batch")
+async def analyze_food_batch(files: List[UploadFile] = File(...)):
+    """
+    Analyzes several images of one meal concurrently, at most ANALYZE_BATCH_CONCURRENCY at a time.
+    Each result carries either the nutrition fields or an "error"; "total" sums the successful ones.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} images can be analyzed at once.")
+    slots = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+
+    async def analyze_one(file: UploadFile) -> dict:
+        async with slots:
+            try:
+                output, cache_status = await analyze_upload(file)
+            except HTTPException as e:
+                return {"filename": file.filename, "error": e.detail, "status": e.status_code}
+            except UpstreamError as e:
+                return {"filename": file.filename, "error": str(e), "status": e.status_code}
+        return {"filename": file.filename, **output, "cache": cache_status}
+
+    results = await asyncio.gather(*(analyze_one(file) for file in files))
+    total = {key: 0 for key in ("calories", "carbs", "protein", "fats", "sodium")}
+    for result in results:
+        if "error" not in result:
+            for key in total:
+                try:
+                    total[key] += float(result.get(key) or 0)
+                except (TypeError, ValueError):
+                    pass
+    return FastJSONResponse(content={
+        "results": results,
+        "total": total,
+        "failed": sum(1 for result in results if "error" in result),
+    })
 
 @app.post("/recommend")
 async def personalize(
@@ -83,7 +236,70 @@ async def personalize(
     user_profile: dict = Body(..., embed=True),
     current_time: str = Body(None, embed=True)
 ):
-    recommendations = get_personalized_recommendations(food_totals, user_profile, current_time)
+    key = json.dumps([food_totals, user_profile, current_time], sort_keys=True, separators=(",", ":"))
+    recommendations = await recommend_flight.do(
+        key, lambda: get_personalized_recommendations(food_totals, user_profile, current_time)
+    )
     if "error" in recommendations:
         raise HTTPException(status_code=500, detail=recommendations["error"])
-    return JSONResponse(content=recommendations)
+    return FastJSONResponse(content=recommendations)
+
+
+@app.post("/recommend/stream")
+async def personalize_stream(
+    food_totals: dict = Body(..., embed=True),
+    user_profile: dict = Body(..., embed=True),
+    current_time: str = Body(None, embed=True)
+):
+    """
+    Streams recommendations as newline-delimited JSON, one recommendation per line.
+    A line with an "error" key means generation failed after the response started.
+    """
+    async def ndjson_lines():
+        async for item in stream_personalized_recommendations(food_totals, user_profile, current_time):
+            yield dumps(item) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/recommend/cohort")
+async def personalize_cohort(
+    users: List[Any] = Body(..., embed=True),
+    current_time: str = Body(None, embed=True)
+):
+    """
+    Recommends for many users at once, with one upstream call per (meal context, budget band,
+    conditions) bucket instead of one per user. Each user is {"id", "food_totals",
+    "user_profile"}; results come back in the same order, with the user's BMR, TDEE and
+    remaining budget, or an "error" for a user that fails validation, followed by bucket
+    counts and timings under "stats".
+    """
+    if not users or len(users) > COHORT_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {COHORT_MAX_USERS} users.")
+    return FastJSONResponse(content=await cohort_recommendations(users, current_time))
+
+
+@app.get("/stats")
+async def stats():
+    """
+    Reports how many /analyze and /recommend requests shared an in-flight upstream call,
+    upstream token usage (including provider-cached prompt tokens) per endpoint, and how
+    often each model tier answered or escalated, the state of each upstream circuit, and
+    what pre-warming has generated, and the state of the analysis job queue.
+    """
+    return {
+        "coalescing": {"analyze": analyze_flight.stats(), "recommend": recommend_flight.stats()},
+        "usage": usage_stats(),
+        "routing": router_stats(),
+        "circuits": circuit_stats(),
+        "prewarm": prewarm_stats(),
+        "jobs": analyze_jobs.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Exposes request, per-stage latency, token and error metrics in Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
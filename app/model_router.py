@@ -0,0 +1,125 @@
+import os
+import time
+from collections import defaultdict
+from app.logs import get_logger
+from app.metrics import time_stage, upstream_errors
+from app.openai_client import create_chat_completion
+from app.resilience import UpstreamUnavailableError, deadline_from_now
+
+logger = get_logger(__name__)
+
+# Model tiers tried in order for each endpoint, overridable with MODEL_ROUTE_<ENDPOINT>
+# (e.g. MODEL_ROUTE_ANALYZE="gpt-4o-mini,gpt-4o"). A single model disables escalation.
+DEFAULT_ROUTE = os.getenv("MODEL_ROUTE_DEFAULT", "gpt-4o-mini,gpt-4o")
+# Self-reported confidence below which an answer is escalated to the next tier.
+MIN_CONFIDENCE = float(os.getenv("MODEL_ROUTE_MIN_CONFIDENCE", "0.5"))
+
+# Plausible range of each nutrient for a single serving; values outside it are escalated.
+# Zero calories is valid: water, plain tea and black coffee.
+NUTRIENT_LIMITS = {
+    "calories": (0, 3000),
+    "carbs": (0, 400),
+    "protein": (0, 250),
+    "fats": (0, 250),
+    "sodium": (0, 10000),
+}
+
+UNKNOWN_NAMES = {"", "unknown", "unknown dish", "n/a", "none", "not food", "unidentified"}
+
+class LowConfidenceError(ValueError):
+    """
+    Raised by a validator when a well-formed answer should not be trusted. The answer is
+    escalated to the next tier; from the last tier it is returned anyway.
+    """
+
+# Per (endpoint, model) counters.
+# "unverified" counts last-tier answers returned although they failed validation.
+route_stats = defaultdict(
+    lambda: {"calls": 0, "accepted": 0, "escalated": 0, "unverified": 0, "failed": 0, "latency_seconds": 0.0}
+)
+
+def get_route(endpoint: str) -> list:
+    route = os.getenv(f"MODEL_ROUTE_{endpoint.upper()}", DEFAULT_ROUTE)
+    return [model.strip() for model in route.split(",") if model.strip()]
+
+def check_dish_name(name) -> None:
+    """
+    Raises ValueError if name is not a string, LowConfidenceError if it names no dish.
+    """
+    if not isinstance(name, str):
+        raise ValueError(f"Dish name is not a string: {name!r}")
+    if name.strip().lower() in UNKNOWN_NAMES:
+        raise LowConfidenceError(f"Unrecognized dish name: {name!r}")
+
+def check_nutrition(nutrition: dict) -> None:
+    """
+    Raises ValueError unless every nutrient in NUTRIENT_LIMITS is a number, and
+    LowConfidenceError if one is out of its plausible range.
+    """
+    for nutrient, (low, high) in NUTRIENT_LIMITS.items():
+        value = nutrition.get(nutrient)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"Missing or non-numeric {nutrient}: {value!r}")
+        if not low <= value <= high:
+            raise LowConfidenceError(f"Implausible {nutrient}: {value!r}")
+
+def check_confidence(confidence) -> None:
+    if isinstance(confidence, (int, float)) and confidence < MIN_CONFIDENCE:
+        raise LowConfidenceError(f"Low confidence: {confidence}")
+
+async def routed_completion(endpoint: str, parse, validate=None, **kwargs):
+    """
+    Calls each model tier of the endpoint's route in turn and returns parse(completion) from
+    the first tier whose answer parses and passes validate(output). parse should raise (for
+    example LLMOutputError, KeyError or ValueError) when the answer fails schema validation;
+    validate raises LowConfidenceError when a well-formed answer is not trustworthy.
+    If the last tier's answer fails only validate, it is returned as is (a photo of something
+    that is not a dish still gets an answer); any other error of the last tier is raised.
+    A tier whose model is unavailable (its circuit is open or its retries ran out) is skipped
+    for the next one; timeouts are raised, as the deadline is spent.
+    All tiers share one deadline, so escalating does not extend UPSTREAM_DEADLINE_<ENDPOINT>.
+    """
+    route = get_route(endpoint)
+    deadline = deadline_from_now(endpoint)
+    for tier, model in enumerate(route):
+        stats = route_stats[(endpoint, model)]
+        stats["calls"] += 1
+        start = time.perf_counter()
+        try:
+            completion = await create_chat_completion(endpoint=endpoint, model=model, deadline=deadline, **kwargs)
+        except Exception as e:
+            stats["latency_seconds"] += time.perf_counter() - start
+            if isinstance(e, UpstreamUnavailableError) and tier < len(route) - 1:
+                stats["escalated"] += 1
+                logger.debug("%s escalating from unavailable %s: %s", endpoint, model, e)
+                continue
+            stats["failed"] += 1
+            raise
+        output = None
+        try:
+            with time_stage("json_parse"):
+                output = parse(completion)
+                if validate is not None:
+                    validate(output)
+        except Exception as e:
+            upstream_errors.inc(endpoint=endpoint, error=type(e).__name__)
+            stats["latency_seconds"] += time.perf_counter() - start
+            if tier == len(route) - 1:
+                if isinstance(e, LowConfidenceError) and output is not None:
+                    stats["unverified"] += 1
+                    logger.info("%s returning unverified answer from %s: %s", endpoint, model, e)
+                    return output
+                stats["failed"] += 1
+                raise
+            stats["escalated"] += 1
+            logger.debug("%s escalating from %s: %s", endpoint, model, e)
+            continue
+        stats["latency_seconds"] += time.perf_counter() - start
+        stats["accepted"] += 1
+        return output
+
+def router_stats() -> dict:
+    return {
+        f"{endpoint}/{model}": dict(stats, mean_latency_seconds=stats["latency_seconds"] / max(stats["calls"], 1))
+        for (endpoint, model), stats in route_stats.items()
+    }
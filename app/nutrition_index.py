@@ -0,0 +1,114 @@
+import os
+import re
+import csv
+from array import array
+from collections import defaultdict
+
+NUTRITION_TABLE_PATH = os.getenv(
+    "NUTRITION_TABLE_PATH", os.path.join(os.path.dirname(__file__), "data", "sg_dishes.csv")
+)
+# Minimum trigram similarity (0-1) for a dish name to be answered from the local table.
+NUTRITION_INDEX_MIN_CONFIDENCE = float(os.getenv("NUTRITION_INDEX_MIN_CONFIDENCE", "0.8"))
+
+NUTRIENTS = ("calories", "carbs", "protein", "fats", "sodium", "fiber", "vitamin_a", "vitamin_c", "vitamin_d")
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercases a dish name and collapses punctuation and whitespace to single spaces.
+    """
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split())
+
+def trigrams(name: str) -> set:
+    """
+    Returns the set of character trigrams of a normalized name, padded so that
+    word boundaries contribute their own trigrams.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NutritionIndex:
+    """
+    In-memory nutrition table for common Singaporean dishes with a fuzzy name index.
+
+    Per-portion nutrient values are stored row-major in a single float array.
+    Every dish name and alias is indexed by its character trigrams, and a query
+    resolves to the alias with the highest Dice similarity.
+    """
+
+    def __init__(self, rows: list):
+        self.names = []
+        self.categories = []
+        # Meal contexts each dish suits; empty means any.
+        self.meals = []
+        self.values = array("f")
+        self.alias_dish = array("H")
+        self.alias_sizes = array("H")
+        self.postings = defaultdict(lambda: array("H"))
+        for row in rows:
+            dish = len(self.names)
+            self.names.append(row["name"])
+            self.categories.append(row.get("category", "meal"))
+            self.meals.append(tuple(meal for meal in (row.get("meals") or "").split("|") if meal))
+            self.values.extend(float(row[nutrient]) for nutrient in NUTRIENTS)
+            aliases = [row["name"]] + [alias for alias in row.get("aliases", "").split("|") if alias]
+            for alias in aliases:
+                grams = trigrams(normalize_name(alias))
+                alias_id = len(self.alias_dish)
+                self.alias_dish.append(dish)
+                self.alias_sizes.append(len(grams))
+                for gram in grams:
+                    self.postings[gram].append(alias_id)
+        self.postings = dict(self.postings)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "NutritionIndex":
+        with open(path, newline="", encoding="utf-8") as table:
+            return cls(list(csv.DictReader(table)))
+
+    def match(self, dish: str) -> tuple:
+        """
+        Returns (dish_index, confidence) for the closest known dish, or (None, 0.0).
+        """
+        grams = trigrams(normalize_name(dish))
+        overlaps = defaultdict(int)
+        for gram in grams:
+            for alias_id in self.postings.get(gram, ()):
+                overlaps[alias_id] += 1
+        if not overlaps:
+            return None, 0.0
+        best_score, best_alias = max(
+            (2 * shared / (len(grams) + self.alias_sizes[alias_id]), -alias_id)
+            for alias_id, shared in overlaps.items()
+        )
+        return self.alias_dish[-best_alias], best_score
+
+    def lookup(self, dish: str, portion: float = 1.0, min_confidence: float = NUTRITION_INDEX_MIN_CONFIDENCE):
+        """
+        Returns nutritional information for the dish scaled linearly by portion, in the same
+        shape as get_nutrition_info_gpt4o, or None when no dish matches confidently enough.
+        """
+        index, confidence = self.match(dish)
+        if index is None or confidence < min_confidence:
+            return None
+        start = index * len(NUTRIENTS)
+        scaled = {
+            nutrient: round(self.values[start + offset] * portion, 1)
+            for offset, nutrient in enumerate(NUTRIENTS)
+        }
+        return {
+            "calories": scaled["calories"],
+            "carbs": scaled["carbs"],
+            "protein": scaled["protein"],
+            "fats": scaled["fats"],
+            "sodium": scaled["sodium"],
+            "fiber": scaled["fiber"],
+            "vitamins": {
+                "vitamin_a": scaled["vitamin_a"],
+                "vitamin_c": scaled["vitamin_c"],
+                "vitamin_d": scaled["vitamin_d"],
+            },
+            "other_nutrients": [],
+        }
+
+# Loaded once at import so lookups never touch the disk.
+nutrition_index = NutritionIndex.from_csv(NUTRITION_TABLE_PATH)
@@ -0,0 +1,130 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from app.metrics import time_stage, upstream_errors
+from app.resilience import (
+    RETRYABLE_ERRORS,
+    call_upstream,
+    circuit_breakers,
+    circuit_rejections,
+    deadline_from_now,
+    UpstreamTimeoutError,
+    UpstreamUnavailableError,
+)
+from app.usage import record_usage
+
+# Load environment variables from .env
+load_dotenv()
+openai_api_key = os.getenv("OPENAI_API_KEY")
+if not openai_api_key:
+    raise ValueError("OPENAI_API_KEY not found in environment variables.")
+
+# Maximum number of chat completion calls allowed in flight at once (per worker).
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "256"))
+# Per-request timeout and SDK retry count; OPENAI_BASE_URL points every module at another
+# compatible server, such as benchmarks/fake_upstream.py. Retries are left to app.resilience,
+# which also enforces per-endpoint deadlines, so the SDK does not retry by default.
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "600"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+
+# A single async client shared by every module, so all requests reuse the same
+# HTTP connection pool instead of opening new connections per call.
+client = AsyncOpenAI(
+    api_key=openai_api_key,
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    timeout=OPENAI_TIMEOUT,
+    max_retries=OPENAI_MAX_RETRIES,
+)
+
+_upstream_slots = None
+
+def _get_upstream_slots() -> asyncio.Semaphore:
+    """
+    Lazily creates the semaphore so it binds to the running event loop.
+    """
+    global _upstream_slots
+    if _upstream_slots is None:
+        _upstream_slots = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+    return _upstream_slots
+
+async def create_chat_completion(endpoint: str = None, deadline: float = None, **kwargs):
+    """
+    Awaits a chat completion on the shared client without blocking the event loop.
+    At most UPSTREAM_CONCURRENCY calls run at once; further calls wait for a free slot.
+    Deadlines apply per endpoint; retries, hedging and the circuit breaker of app.resilience
+    apply per endpoint and model. deadline (an absolute event loop time) lets several calls
+    share one request's deadline.
+    Token usage is recorded under endpoint when one is given.
+    """
+    async def attempt():
+        async with _get_upstream_slots():
+            try:
+                with time_stage("upstream"):
+                    return await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                upstream_errors.inc(endpoint=endpoint or "", error=type(e).__name__)
+                raise
+
+    completion = await call_upstream(endpoint or "", attempt, deadline, kwargs.get("model", ""))
+    if endpoint:
+        record_usage(endpoint, completion.usage)
+    return completion
+
+async def stream_chat_completion(endpoint: str = None, **kwargs):
+    """
+    Streams a chat completion on the shared client, yielding content deltas as they arrive.
+    The upstream slot is held until the stream is exhausted or closed.
+    Token usage, sent in the final chunk, is recorded under endpoint when one is given.
+    Content already yielded cannot be replayed, so streams are not retried or hedged. The
+    whole stream must finish within the endpoint's deadline, however steadily chunks arrive,
+    or UpstreamTimeoutError is raised. The circuit breaker still applies; as with buffered
+    calls, only timeouts and retryable errors count as failures.
+    """
+    if endpoint:
+        kwargs["stream_options"] = {"include_usage": True}
+    breaker = circuit_breakers[(endpoint or "", kwargs.get("model", ""))]
+    if not breaker.allow():
+        circuit_rejections.inc(endpoint=endpoint or "")
+        raise UpstreamUnavailableError("Upstream model API is unavailable.", retry_after=breaker.retry_after())
+    loop = asyncio.get_running_loop()
+    deadline = deadline_from_now(endpoint or "")
+    stream = None
+    async with _get_upstream_slots():
+        try:
+            with time_stage("upstream"):
+                # Each wait is bounded by the time left, so the deadline covers the whole stream
+                # rather than the gap between two chunks.
+                stream = await asyncio.wait_for(
+                    client.chat.completions.create(stream=True, **kwargs), deadline - loop.time()
+                )
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    if endpoint and chunk.usage is not None:
+                        record_usage(endpoint, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except asyncio.TimeoutError:
+            upstream_errors.inc(endpoint=endpoint or "", error="UpstreamTimeoutError")
+            breaker.record_failure()
+            raise UpstreamTimeoutError("Upstream model API did not answer in time.") from None
+        except RETRYABLE_ERRORS as e:
+            upstream_errors.inc(endpoint=endpoint or "", error=type(e).__name__)
+            breaker.record_failure()
+            raise
+        except Exception as e:
+            # Bad requests and the like are not an outage; as in call_upstream, they don't
+            # trip the circuit.
+            upstream_errors.inc(endpoint=endpoint or "", error=type(e).__name__)
+            breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            # A stream closed early by its consumer must not hold the half-open trial.
+            breaker.trial_in_flight = False
+            if stream is not None:
+                await stream.close()
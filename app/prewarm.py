@@ -0,0 +1,107 @@
+import os
+import asyncio
+import datetime
+from app.get_personalized_recommendations import RECOMMENDATION_ENGINE, get_personalized_recommendations
+from app.logs import get_logger
+from app.metrics import Counter
+from app.recommendation_cache import recommendation_cache, top_traffic
+
+logger = get_logger(__name__)
+
+# Set to "0" to disable pre-warming.
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+# How long before each meal window the cache is warmed. Keep it below RECOMMENDATION_CACHE_TTL
+# so warmed entries are still valid when the window opens.
+PREWARM_LEAD_MINUTES = float(os.getenv("PREWARM_LEAD_MINUTES", "10"))
+# Keys generated per window (one upstream call each, two if the answer is escalated),
+# and how many are generated at once.
+PREWARM_MAX_CALLS = int(os.getenv("PREWARM_MAX_CALLS", "50"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "4"))
+
+# Local start of each meal window, matching determine_meal_context. Breakfast has no lower
+# bound there, so it is warmed ahead of the morning rush instead.
+MEAL_WINDOW_STARTS = (
+    ("breakfast", datetime.time(6, 0)),
+    ("lunch", datetime.time(11, 0)),
+    ("dinner", datetime.time(16, 0)),
+    ("supper", datetime.time(21, 0)),
+)
+
+prewarm_results = Counter("prewarm_total", "Pre-warmed recommendation keys by outcome.", ("meal_context", "outcome"))
+prewarm_totals = {"windows": 0, "warmed": 0, "already_cached": 0, "failed": 0}
+
+def next_window(now: datetime.datetime) -> tuple:
+    """
+    Returns (meal_context, start) of the next window whose warm-up time is still ahead of now.
+    """
+    lead = datetime.timedelta(minutes=PREWARM_LEAD_MINUTES)
+    for days in (0, 1):
+        day = now.date() + datetime.timedelta(days=days)
+        for meal_context, start_time in MEAL_WINDOW_STARTS:
+            start = datetime.datetime.combine(day, start_time)
+            if start - lead > now:
+                return meal_context, start
+    raise AssertionError("unreachable")
+
+async def prewarm_window(meal_context: str, start: datetime.datetime, max_calls: int = PREWARM_MAX_CALLS) -> dict:
+    """
+    Generates and caches recommendations for the meal context's most requested cache keys
+    that are not cached yet, spending at most max_calls upstream calls.
+    """
+    current_time = start.strftime("%I:%M %p")
+    slots = asyncio.Semaphore(PREWARM_CONCURRENCY)
+    result = {"warmed": 0, "already_cached": 0, "failed": 0}
+    to_warm = []
+    # Look past the budget so keys that are still cached don't use it up.
+    for key, entry in top_traffic(meal_context, 4 * max_calls):
+        if len(to_warm) >= max_calls:
+            break
+        if recommendation_cache.get(key) is not None:
+            result["already_cached"] += 1
+        else:
+            to_warm.append(entry)
+
+    async def warm(entry: dict):
+        async with slots:
+            try:
+                output = await get_personalized_recommendations(
+                    entry["food_totals"], entry["user_profile"], current_time, track_traffic=False
+                )
+                outcome = "failed" if "error" in output else "warmed"
+            except Exception as e:
+                logger.warning("Pre-warming %s failed: %s", meal_context, e)
+                outcome = "failed"
+        result[outcome] += 1
+
+    await asyncio.gather(*(warm(entry) for entry in to_warm))
+    for outcome, count in result.items():
+        prewarm_totals[outcome] += count
+        prewarm_results.inc(count, meal_context=meal_context, outcome=outcome)
+    prewarm_totals["windows"] += 1
+    logger.info("Pre-warmed %s: %s", meal_context, result)
+    return result
+
+async def run_prewarm_scheduler():
+    """
+    Sleeps until PREWARM_LEAD_MINUTES before each meal window and pre-warms it, forever.
+    """
+    while True:
+        meal_context, start = next_window(datetime.datetime.now())
+        wake_at = start - datetime.timedelta(minutes=PREWARM_LEAD_MINUTES)
+        await asyncio.sleep(max(0.0, (wake_at - datetime.datetime.now()).total_seconds()))
+        try:
+            await prewarm_window(meal_context, start)
+        except Exception:
+            logger.exception("Pre-warming %s failed", meal_context)
+
+def start_prewarm_scheduler():
+    """
+    Starts the scheduler as a background task and returns it, or None when pre-warming is
+    disabled or recommendations come from the local engine and need no warming.
+    """
+    if not PREWARM_ENABLED or RECOMMENDATION_ENGINE == "local":
+        return None
+    return asyncio.create_task(run_prewarm_scheduler())
+
+def prewarm_stats() -> dict:
+    return dict(prewarm_totals)
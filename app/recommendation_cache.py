@@ -0,0 +1,101 @@
+import os
+import copy
+from app.cache import LRUTTLCache
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "2048"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "1800"))
+
+# Bucket widths used to coarsen the cache key. Wider buckets raise the hit rate
+# at the cost of less personalized recommendations.
+CALORIE_BUCKET = float(os.getenv("RECOMMENDATION_CALORIE_BUCKET", "100"))
+AGE_BAND = float(os.getenv("RECOMMENDATION_AGE_BAND", "10"))
+WEIGHT_BAND = float(os.getenv("RECOMMENDATION_WEIGHT_BAND", "5"))
+HEIGHT_BAND = float(os.getenv("RECOMMENDATION_HEIGHT_BAND", "10"))
+STEPS_BAND = float(os.getenv("RECOMMENDATION_STEPS_BAND", "2500"))
+
+# Recent requests per cache key, kept so the cache can be pre-warmed ahead of meal windows.
+RECOMMENDATION_TRAFFIC_SIZE = int(os.getenv("RECOMMENDATION_TRAFFIC_SIZE", "10000"))
+RECOMMENDATION_TRAFFIC_WINDOW = float(os.getenv("RECOMMENDATION_TRAFFIC_WINDOW", str(2 * 24 * 3600)))
+
+recommendation_cache = LRUTTLCache(maxsize=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL)
+recent_traffic = LRUTTLCache(maxsize=RECOMMENDATION_TRAFFIC_SIZE, ttl=RECOMMENDATION_TRAFFIC_WINDOW)
+
+def _band(value, width: float):
+    """
+    Returns the index of the band of the given width that value falls in, or None if
+    the value is missing, not numeric or infinite.
+    """
+    try:
+        return int(float(value) // width)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def normalize_conditions(conditions) -> tuple:
+    """
+    Normalizes medical conditions given as a list or a comma-separated string into a
+    sorted tuple of lowercase names.
+    """
+    if not conditions:
+        return ()
+    if isinstance(conditions, str):
+        conditions = conditions.split(",")
+    elif not isinstance(conditions, (list, tuple, set)):
+        conditions = [conditions]
+    return tuple(sorted({str(condition).strip().lower() for condition in conditions if str(condition).strip()}))
+
+def recommendation_cache_key(user_profile: dict, meal_context: str, remaining_cal) -> tuple:
+    """
+    Builds the cache key for a recommendation request from the meal context, the bucketed
+    remaining calorie budget, the medical conditions and banded profile fields.
+    """
+    return (
+        meal_context,
+        _band(remaining_cal, CALORIE_BUCKET),
+        normalize_conditions(user_profile.get("medicalConditions")),
+        _band(user_profile.get("age"), AGE_BAND),
+        _band(user_profile.get("weight"), WEIGHT_BAND),
+        _band(user_profile.get("height"), HEIGHT_BAND),
+        _band(user_profile.get("targetWeight"), WEIGHT_BAND),
+        _band(user_profile.get("targetLoss"), WEIGHT_BAND),
+        _band(user_profile.get("stepsPerDay"), STEPS_BAND),
+    )
+
+def personalize_cached(recommendations: dict, remaining_cal) -> dict:
+    """
+    Returns a copy of cached recommendations with each "remainingAfter" recomputed from
+    the requesting user's exact remaining calorie budget.
+    """
+    result = copy.deepcopy(recommendations)
+    if isinstance(remaining_cal, (int, float)):
+        for item in result.get("recommendations", []):
+            try:
+                item["remainingAfter"] = remaining_cal - float(item["estimatedNutrition"]["calories"])
+            except (KeyError, TypeError, ValueError):
+                pass
+    return result
+
+def record_traffic(cache_key: tuple, food_totals: dict, user_profile: dict) -> None:
+    """
+    Counts a request under its cache key and keeps its inputs as the key's representative,
+    so the same recommendations can be generated again later.
+    """
+    entry = recent_traffic.get(cache_key)
+    recent_traffic.set(cache_key, {
+        "count": (entry["count"] if entry else 0) + 1,
+        "food_totals": food_totals,
+        "user_profile": user_profile,
+    })
+
+def top_traffic(meal_context: str, limit: int) -> list:
+    """
+    Returns up to limit (cache_key, entry) pairs of the meal context, most requested first.
+    """
+    entries = []
+    for key in recent_traffic.keys():
+        if key[0] != meal_context:
+            continue
+        entry = recent_traffic.get(key)
+        if entry is not None:
+            entries.append((key, entry))
+    entries.sort(key=lambda item: item[1]["count"], reverse=True)
+    return entries[:limit]
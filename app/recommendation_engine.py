@@ -0,0 +1,199 @@
+import os
+import json
+import numpy as np
+from app.llm_output import parse_llm_json
+from app.logs import get_logger
+from app.nutrition_index import NUTRIENTS, nutrition_index
+from app.model_router import routed_completion
+from app.recommendation_cache import normalize_conditions
+
+# Set to "1" to have GPT‑4o rewrite the explanation text for the locally selected dishes.
+RECOMMENDATION_LLM_EXPLANATIONS = os.getenv("RECOMMENDATION_LLM_EXPLANATIONS", "0") == "1"
+
+MAX_RECOMMENDATIONS = 5
+
+logger = get_logger(__name__)
+
+# Portion variants considered for every dish, with the suffix added to the dish name.
+PORTIONS = np.array([1.0, 0.75, 0.5])
+PORTION_LABELS = ("", " (reduced portion)", " (half portion)")
+
+# Share of the remaining calorie budget a single meal should use, per meal context.
+MEAL_SHARE = {"breakfast": 1 / 3, "lunch": 1 / 2, "dinner": 1.0, "supper": 1.0}
+# Supper is kept light regardless of the remaining budget.
+SUPPER_MAX_CALORIES = 350
+# Typical meal size used when the user has no calorie target.
+DEFAULT_MEAL_CALORIES = 600
+# Below this many remaining calories, resting is offered instead of another meal.
+LOW_BUDGET_CALORIES = 150
+DAILY_SODIUM_LIMIT = 2000
+
+# Per-serving limits applied as hard filters when a medical condition mentions the keyword.
+CONDITION_LIMITS = (
+    ("blood pressure", "sodium", 800),
+    ("hypertension", "sodium", 800),
+    ("kidney", "sodium", 800),
+    ("cholesterol", "fats", 15),
+    ("heart", "fats", 15),
+    ("diabetes", "carbs", 60),
+)
+
+COLUMNS = ("calories", "carbs", "protein", "fats", "sodium")
+UNITS = {"carbs": "g", "fats": "g", "sodium": "mg"}
+
+# Candidate matrix: one row per (dish, portion), columns as in COLUMNS.
+_base = np.frombuffer(nutrition_index.values, dtype=np.float32).reshape(-1, len(NUTRIENTS))
+_base = _base[:, [NUTRIENTS.index(column) for column in COLUMNS]].astype(np.float64)
+CANDIDATES = (_base[:, None, :] * PORTIONS[None, :, None]).reshape(-1, len(COLUMNS))
+CANDIDATE_DISH = np.repeat(np.arange(len(nutrition_index.names)), len(PORTIONS))
+CANDIDATE_PORTION = np.tile(np.arange(len(PORTIONS)), len(nutrition_index.names))
+CANDIDATE_IS_MEAL = np.repeat(np.array([category == "meal" for category in nutrition_index.categories]), len(PORTIONS))
+# Candidates suited to each meal context, from the catalog's meals column (empty suits all).
+CANDIDATE_SUITS = {
+    context: np.repeat(np.array([not meals or context in meals for meals in nutrition_index.meals]), len(PORTIONS))
+    for context in MEAL_SHARE
+}
+
+REST_RECOMMENDATION = {
+    "food": "Drink water and sleep early",
+    "estimatedNutrition": {"calories": 0, "carbs": 0, "protein": 0, "fats": 0, "sodium": 0},
+    "explanation": "Your calorie budget for today is nearly used up, so skipping another meal keeps you on target.",
+}
+
+def meal_target(meal_context: str, remaining_cal) -> float:
+    """
+    Returns the calorie target for the next meal given the meal context and remaining budget.
+    """
+    if not isinstance(remaining_cal, (int, float)):
+        target = DEFAULT_MEAL_CALORIES
+    else:
+        target = max(remaining_cal, 0) * MEAL_SHARE[meal_context]
+    if meal_context == "supper":
+        target = min(target, SUPPER_MAX_CALORIES)
+    return target
+
+def score_candidates(target: float, remaining_cal, sodium_left: float) -> np.ndarray:
+    """
+    Scores every candidate row at once; higher is better.
+    Rewards closeness to the meal target and protein density, and penalizes sodium against
+    what is left of the daily limit and any overshoot of the remaining budget.
+    """
+    calories = CANDIDATES[:, 0]
+    protein = CANDIDATES[:, 2]
+    sodium = CANDIDATES[:, 4]
+    score = -np.abs(calories - target) / max(target, 1.0)
+    score += 0.5 * (protein * 4) / np.maximum(calories, 1.0)
+    score -= 0.2 * sodium / max(sodium_left, 500.0)
+    if isinstance(remaining_cal, (int, float)):
+        score -= 2.0 * np.maximum(calories - max(remaining_cal, 0), 0) / max(target, 1.0)
+    return score
+
+def condition_limits(conditions: tuple) -> dict:
+    """
+    Returns the limits implied by the medical conditions as {column: (limit, conditions)},
+    naming only the conditions that matched a CONDITION_LIMITS keyword.
+    """
+    limits = {}
+    for keyword, column, limit in CONDITION_LIMITS:
+        for condition in conditions:
+            if keyword in condition:
+                current, names = limits.get(column, (limit, ()))
+                limits[column] = (min(current, limit), names + (condition,) * (condition not in names))
+    return limits
+
+def condition_mask(limits: dict) -> np.ndarray:
+    """
+    Returns a boolean mask of candidates that respect the limits from condition_limits.
+    """
+    mask = np.ones(len(CANDIDATES), dtype=bool)
+    for column, (limit, _) in limits.items():
+        mask &= CANDIDATES[:, COLUMNS.index(column)] <= limit
+    return mask
+
+def explain(meal_context: str, nutrition: dict, remaining_after, limits: dict) -> str:
+    text = f"About {nutrition['calories']:.0f} kcal with {nutrition['protein']:.0f}g protein as your {meal_context}"
+    if isinstance(remaining_after, (int, float)):
+        text += f", leaving {remaining_after:.0f} kcal of today's budget"
+    text += "."
+    for column, (limit, conditions) in limits.items():
+        unit = UNITS[column]
+        text += (f" {column.capitalize()} {nutrition[column]:.0f}{unit} is within the {limit}{unit} limit"
+                 f" for {', '.join(conditions)}.")
+    return text
+
+def rank_recommendations(food_totals: dict, user_profile: dict, meal_context: str, remaining_cal) -> dict:
+    """
+    Deterministically selects up to MAX_RECOMMENDATIONS dishes from the local catalog and returns
+    them in the same shape as get_personalized_recommendations.
+    """
+    conditions = normalize_conditions(user_profile.get("medicalConditions"))
+    sodium_left = DAILY_SODIUM_LIMIT - float(food_totals.get("sodium", 0) or 0)
+    target = meal_target(meal_context, remaining_cal)
+
+    score = score_candidates(target, remaining_cal, sodium_left)
+    limits = condition_limits(conditions)
+    allowed = condition_mask(limits) & CANDIDATE_SUITS[meal_context]
+    # Snacks and drinks are only offered for supper; other meal contexts get full meals.
+    if meal_context != "supper":
+        allowed &= CANDIDATE_IS_MEAL
+    score[~allowed] = -np.inf
+    # Stable sort on the negated score keeps ties in catalog order, so results are reproducible.
+    order = np.argsort(-score, kind="stable")
+
+    recommendations = []
+    if isinstance(remaining_cal, (int, float)) and remaining_cal < LOW_BUDGET_CALORIES:
+        recommendations.append(dict(REST_RECOMMENDATION, remainingAfter=remaining_cal))
+    chosen = set()
+    for row in order:
+        if len(recommendations) >= MAX_RECOMMENDATIONS or not np.isfinite(score[row]):
+            break
+        dish = int(CANDIDATE_DISH[row])
+        if dish in chosen:
+            continue
+        chosen.add(dish)
+        nutrition = {column: round(float(value), 1) for column, value in zip(COLUMNS, CANDIDATES[row])}
+        if isinstance(remaining_cal, (int, float)):
+            remaining_after = round(remaining_cal - nutrition["calories"], 1)
+        else:
+            remaining_after = remaining_cal
+        recommendations.append({
+            "food": nutrition_index.names[dish] + PORTION_LABELS[CANDIDATE_PORTION[row]],
+            "estimatedNutrition": nutrition,
+            "explanation": explain(meal_context, nutrition, remaining_after, limits),
+            "remainingAfter": remaining_after,
+        })
+    return {"recommendations": recommendations}
+
+async def add_llm_explanations(output: dict, meal_context: str, user_details_str: str) -> dict:
+    """
+    Asks the model for one short explanation per selected dish and replaces the template text.
+    The selection itself is never changed; on any failure the template explanations are kept.
+    """
+    foods = [item["food"] for item in output["recommendations"]]
+    prompt = (
+        f"Context: Singapore. Meal: {meal_context}. User profile: {user_details_str}. "
+        f"For each of these recommended options, in order, write a one-sentence explanation of why it suits the user: "
+        f"{json.dumps(foods)}. "
+        "Output a valid JSON object with a key 'explanations' whose value is a list of strings of the same length."
+    )
+
+    def parse_explanations(completion) -> list:
+        explanations = parse_llm_json(completion.choices[0].message.content)["explanations"]
+        if not isinstance(explanations, list) or len(explanations) != len(foods):
+            raise ValueError("Expected one explanation per recommendation")
+        return explanations
+
+    try:
+        explanations = await routed_completion(
+            "recommend_explain",
+            parse_explanations,
+            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            max_completion_tokens=60 * len(foods) + 20,
+        )
+        for item, explanation in zip(output["recommendations"], explanations):
+            item["explanation"] = str(explanation)
+    except Exception as e:
+        logger.warning("Keeping template explanations: %s", e)
+    return output
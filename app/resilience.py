@@ -0,0 +1,234 @@
+import os
+import time
+import random
+import asyncio
+from collections import defaultdict, deque
+import openai
+from app.logs import get_logger
+from app.metrics import Counter
+
+logger = get_logger(__name__)
+
+# Total time allowed for a request's upstream work, including retries, hedges, escalation
+# to further model tiers and, for streams, reading the whole stream. Overridable per
+# endpoint with UPSTREAM_DEADLINE_<ENDPOINT> (e.g. UPSTREAM_DEADLINE_ANALYZE=20).
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "30"))
+# Retries for connection errors, timeouts, 429s and 5xx responses, with full-jitter backoff.
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+# Set to "1" to send a duplicate request when the first one is slower than the recent p95
+# of the same endpoint and model, and use whichever answers first.
+UPSTREAM_HEDGING = os.getenv("UPSTREAM_HEDGING", "0") == "1"
+HEDGE_WINDOW = int(os.getenv("UPSTREAM_HEDGE_WINDOW", "200"))
+HEDGE_MIN_SAMPLES = 20
+# Consecutive failed calls that open the circuit of an endpoint and model, and how long it
+# stays open.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+upstream_retries = Counter("upstream_retries_total", "Upstream attempts retried after a retryable error.", ("endpoint",))
+upstream_hedges = Counter("upstream_hedges_total", "Duplicate upstream requests sent past the p95.", ("endpoint",))
+circuit_rejections = Counter("circuit_open_rejections_total", "Upstream calls refused by an open circuit.", ("endpoint",))
+
+class UpstreamError(Exception):
+    """
+    An upstream failure the API reports to clients with status_code instead of a 500.
+    """
+    status_code = 502
+    retry_after = None
+
+class UpstreamTimeoutError(UpstreamError):
+    status_code = 504
+
+class UpstreamUnavailableError(UpstreamError):
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def get_deadline(endpoint: str) -> float:
+    return float(os.getenv(f"UPSTREAM_DEADLINE_{endpoint.upper()}", UPSTREAM_DEADLINE))
+
+def deadline_from_now(endpoint: str) -> float:
+    """
+    Returns the endpoint's deadline as an absolute event loop time, to be shared by every
+    upstream call made for one request.
+    """
+    return asyncio.get_running_loop().time() + get_deadline(endpoint)
+
+def backoff_delay(retry: int) -> float:
+    """
+    Full-jitter exponential backoff: a random delay up to base * 2^retry.
+    """
+    return random.uniform(0, UPSTREAM_RETRY_BASE_DELAY * (2 ** retry))
+
+class LatencyTracker:
+    """
+    Keeps the latest successful call latencies of one endpoint and their p95.
+    """
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._p95 = None
+        self._since_update = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._since_update += 1
+        # Re-sorting every 20 samples keeps the estimate fresh without sorting on every call.
+        if self._p95 is None or self._since_update >= 20:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+            self._since_update = 0
+
+    def hedge_delay(self):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return self._p95
+
+class CircuitBreaker:
+    """
+    Fails calls fast after failure_threshold consecutive failures. After reset_seconds one
+    trial call is let through (half-open); its success closes the circuit again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("Opening upstream circuit after %d consecutive failures", self.failures)
+            self.opened_at = time.monotonic()
+
+# Keyed by (endpoint, model): the tiers of a model route have their own latency and
+# their own outages, so a failing cheap tier must not block the fallback tier.
+latency_trackers = defaultdict(LatencyTracker)
+circuit_breakers = defaultdict(CircuitBreaker)
+
+async def _timed_attempt(key: tuple, attempt):
+    start = time.perf_counter()
+    result = await attempt()
+    latency_trackers[key].record(time.perf_counter() - start)
+    return result
+
+async def _hedged(key: tuple, attempt):
+    """
+    Runs attempt(); with hedging on, starts a second copy once the first has taken longer
+    than the p95 of the same endpoint and model and returns whichever succeeds first.
+    """
+    delay = latency_trackers[key].hedge_delay() if UPSTREAM_HEDGING else None
+    first = asyncio.ensure_future(_timed_attempt(key, attempt))
+    if delay is None:
+        return await first
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            upstream_hedges.inc(endpoint=key[0])
+            pending.add(asyncio.ensure_future(_timed_attempt(key, attempt)))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def call_upstream(endpoint: str, attempt, deadline: float = None, model: str = ""):
+    """
+    Awaits attempt() (a coroutine function making one upstream request to model) before
+    deadline (an absolute event loop time, by default the endpoint's deadline from now),
+    retrying retryable errors with jittered backoff, hedging slow attempts when enabled, and
+    failing fast while the circuit of the endpoint and model is open.
+    Raises UpstreamTimeoutError when the deadline passes and UpstreamUnavailableError when
+    the circuit is open or retries are exhausted; other errors propagate unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = deadline_from_now(endpoint)
+    elif loop.time() >= deadline:
+        # Spent by earlier calls of the same request; not a failure of this upstream.
+        raise UpstreamTimeoutError("Upstream model API did not answer in time.")
+    key = (endpoint, model)
+    breaker = circuit_breakers[key]
+    if not breaker.allow():
+        circuit_rejections.inc(endpoint=endpoint)
+        raise UpstreamUnavailableError("Upstream model API is unavailable.", retry_after=breaker.retry_after())
+    error = None
+    for retry in range(UPSTREAM_RETRIES + 1):
+        try:
+            result = await asyncio.wait_for(_hedged(key, attempt), deadline - loop.time())
+        except asyncio.CancelledError:
+            # The caller went away; let the next caller run the half-open trial instead.
+            breaker.trial_in_flight = False
+            raise
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            raise UpstreamTimeoutError("Upstream model API did not answer in time.") from None
+        except RETRYABLE_ERRORS as e:
+            error = e
+            delay = backoff_delay(retry)
+            if retry == UPSTREAM_RETRIES or loop.time() + delay >= deadline:
+                break
+            upstream_retries.inc(endpoint=endpoint)
+            logger.debug("Retrying %s after %s", endpoint, type(e).__name__)
+            await asyncio.sleep(delay)
+            continue
+        except Exception:
+            # Bad requests and the like are not an outage; they don't trip the circuit.
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+    breaker.record_failure()
+    raise UpstreamUnavailableError(f"Upstream model API failed: {type(error).__name__}") from error
+
+def circuit_label(endpoint: str, model: str) -> str:
+    return f"{endpoint}/{model}" if model else endpoint
+
+def circuit_stats() -> dict:
+    return {
+        circuit_label(endpoint, model): {"state": breaker.state, "consecutive_failures": breaker.failures}
+        for (endpoint, model), breaker in circuit_breakers.items()
+    }
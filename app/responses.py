@@ -0,0 +1,22 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+from app.llm_output import orjson
+from app.metrics import time_stage
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes content to compact JSON bytes, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse that renders with orjson when it is installed.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with time_stage("response_build"):
+            return dumps(content)
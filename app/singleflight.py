@@ -0,0 +1,33 @@
+import asyncio
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work; callers arriving while it is still
+    in flight wait on the same task and receive its result, or its exception.
+    Counters record how many calls ran and how many were served by another caller's call.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Returns the result of await fn(), sharing one execution among concurrent callers with the same key.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield the shared task so one caller disconnecting does not cancel it for the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
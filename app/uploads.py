@@ -0,0 +1,77 @@
+import os
+import base64
+from fastapi import HTTPException, UploadFile
+from starlette.responses import PlainTextResponse
+
+# Largest accepted image upload, in bytes.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Reads an uploaded file into memory with a single read, so the body Starlette has already
+    spooled is copied once. Raises a 413 HTTPException if the upload exceeds max_bytes.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image exceeds the {max_bytes} byte upload limit.")
+    data = await file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image exceeds the {max_bytes} byte upload limit.")
+    return data
+
+def encode_image_bytes(image_bytes: bytes) -> str:
+    """
+    Encodes image bytes to Base64 format.
+    """
+    return base64.b64encode(image_bytes).decode("ascii")
+
+class BodyTooLarge(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=413, detail="Request body too large.")
+
+class MaxBodySizeMiddleware:
+    """
+    ASGI middleware that rejects requests with a 413 once their body exceeds the limit.
+    limits maps request paths to their maximum body size. A declared Content-Length is
+    checked before the body is read; chunked bodies, which have none, are counted as they
+    are received and cut off as soon as they pass the limit, before Starlette can buffer
+    or spool the rest.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.limits[scope["path"]]
+        for name, value in scope["headers"]:
+            if name == b"content-length" and int(value) > max_bytes:
+                await PlainTextResponse("Request body too large.", status_code=413)(scope, receive, send)
+                return
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised inside the request's body parsing, so FastAPI answers it as a 413.
+                    raise BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            if response_started:
+                raise
+            await PlainTextResponse("Request body too large.", status_code=413)(scope, receive, send)
@@ -0,0 +1,24 @@
+from collections import defaultdict
+from app.metrics import upstream_tokens
+
+# Token usage per endpoint label, accumulated from completion.usage.
+usage_totals = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+
+def record_usage(endpoint: str, usage) -> None:
+    """
+    Adds a completion's usage, including provider-side cached prompt tokens, to the endpoint's totals.
+    """
+    if usage is None:
+        return
+    totals = usage_totals[endpoint]
+    totals["calls"] += 1
+    totals["prompt_tokens"] += usage.prompt_tokens or 0
+    totals["completion_tokens"] += usage.completion_tokens or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    totals["cached_tokens"] += (getattr(details, "cached_tokens", None) or 0) if details else 0
+    upstream_tokens.inc(usage.prompt_tokens or 0, endpoint=endpoint, kind="prompt")
+    upstream_tokens.inc((getattr(details, "cached_tokens", None) or 0) if details else 0, endpoint=endpoint, kind="cached")
+    upstream_tokens.inc(usage.completion_tokens or 0, endpoint=endpoint, kind="completion")
+
+def usage_stats() -> dict:
+    return {endpoint: dict(totals) for endpoint, totals in usage_totals.items()}
@@ -0,0 +1,74 @@
+"""
+Overloads /recommend at twice its capacity and compares the app with admission control
+effectively off and on.
+
+The app runs under uvicorn with UPSTREAM_CONCURRENCY=16 against a fake upstream answering
+in 0.5 s, so it can serve about 32 requests per second. Requests arrive open-loop at
+BENCH_RATE (64/s) for BENCH_SECONDS (10 s), each with a different intake so no cache or
+coalescing applies. With admission off the backlog grows for the whole run; with it on,
+excess requests are refused at once with 503 and Retry-After, and the ones admitted keep
+their normal latency.
+
+Run from the repository root with:
+    python -m benchmarks.bench_admission
+"""
+import os
+import time
+import asyncio
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import APP_PORT, percentile, start_app, start_fake_upstream, stop
+
+RATE = float(os.getenv("BENCH_RATE", "64"))
+SECONDS = float(os.getenv("BENCH_SECONDS", "10"))
+
+SETTINGS = {
+    "off": {"ADMISSION_MAX_IN_FLIGHT": "100000", "ADMISSION_QUEUE_TIMEOUT": "1000000"},
+    "on": {"ADMISSION_MAX_IN_FLIGHT": "16", "ADMISSION_QUEUE_DEPTH": "64", "ADMISSION_QUEUE_TIMEOUT": "2"},
+}
+
+def payload(index: int) -> dict:
+    return {
+        "food_totals": {"calories": 600 + index, "carbs": 150, "protein": 60, "fats": 40, "sodium": 2000},
+        "user_profile": {"age": 30, "weight": 70, "height": 175, "dailyCalorieTarget": 2000},
+        "current_time": "12:30 PM",
+    }
+
+async def overload() -> tuple:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=None, limits=limits) as client:
+        served = []
+        statuses = Counter()
+
+        async def one(index: int):
+            await asyncio.sleep(index / RATE)
+            start = time.perf_counter()
+            response = await client.post("/recommend", json=payload(index))
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                served.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(int(RATE * SECONDS))))
+        return served, statuses, time.perf_counter() - start
+
+def run(mode: str):
+    server = start_app(**SETTINGS[mode], UPSTREAM_CONCURRENCY="16", RATE_LIMIT_PER_MINUTE="0",
+                       RECOMMENDATION_CACHE_SIZE="0")
+    try:
+        served, statuses, elapsed = asyncio.run(overload())
+    finally:
+        stop(server)
+    print(f"{mode:<10} {len(served):>7} {percentile(served, 0.5) * 1000:>8.0f} {percentile(served, 0.99) * 1000:>8.0f} "
+          f"{statuses[503]:>6} {statuses[504]:>6} {elapsed:>8.1f}")
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0.5")
+    try:
+        print(f"{'admission':<10} {'served':>7} {'p50 ms':>8} {'p99 ms':>8} {'503':>6} {'504':>6} {'wall s':>8}")
+        for mode in ("off", "on"):
+            run(mode)
+    finally:
+        stop(upstream)
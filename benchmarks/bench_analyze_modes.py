@@ -0,0 +1,59 @@
+"""
+Compares output tokens and p50/p95 latency of get_food_info in compact and verbose mode.
+
+By default this runs against the fake upstream, which charges FAKE_UPSTREAM_TOKEN_LATENCY
+seconds per generated token on top of a fixed latency, so the numbers show the effect of
+output length only. With BENCH_LIVE=1 it uses the configured API and a real image instead
+(BENCH_IMAGE, a path to a JPEG).
+
+Run from the repository root with:
+    python -m benchmarks.bench_analyze_modes
+"""
+import os
+import time
+import asyncio
+
+from benchmarks.common import percentile, start_fake_upstream, stop, use_fake_upstream
+
+LIVE = os.getenv("BENCH_LIVE") == "1"
+CALLS = int(os.getenv("BENCH_CALLS", "40"))
+if not LIVE:
+    use_fake_upstream()
+
+from app.get_food_info import get_food_info
+from app.uploads import encode_image_bytes
+from app.usage import usage_totals
+
+async def run(mode: str, image_base64: str):
+    usage_totals.clear()
+    latencies = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        result = await get_food_info(image_base64, detail="low", mode=mode)
+        latencies.append(time.perf_counter() - start)
+        if "error" in result:
+            print(mode, result["error"])
+            return
+    output_tokens = usage_totals["analyze"]["completion_tokens"] / CALLS
+    print(f"{mode:<8} {output_tokens:>8.0f} {percentile(latencies, 0.5) * 1000:>8.0f} {percentile(latencies, 0.95) * 1000:>8.0f}")
+
+async def main():
+    if LIVE:
+        with open(os.environ["BENCH_IMAGE"], "rb") as image_file:
+            image_bytes = image_file.read()
+    else:
+        image_bytes = b"\xff\xd8fake"
+    image_base64 = encode_image_bytes(image_bytes)
+    print(f"{'mode':<8} {'out tok':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ("verbose", "compact"):
+        await run(mode, image_base64)
+
+if __name__ == "__main__":
+    upstream = None
+    if not LIVE:
+        upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0.3", FAKE_UPSTREAM_TOKEN_LATENCY="0.01")
+    try:
+        asyncio.run(main())
+    finally:
+        if upstream is not None:
+            stop(upstream)
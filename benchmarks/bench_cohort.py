@@ -0,0 +1,103 @@
+"""
+Compares refreshing recommendations for a cohort one user at a time with /recommend/cohort.
+
+BENCH_USERS synthetic employees (random age, weight, height, steps, intake and 20% with a
+medical condition) are refreshed at lunch against the fake upstream:
+
+- per user: get_personalized_recommendations for every user, BENCH_CONCURRENCY at a time,
+  with an empty recommendation cache.
+- cohort:   one cohort_recommendations call, with an empty recommendation cache.
+
+Also times the energy budget computation alone: the per-user scalar path against the
+vectorized NumPy pass.
+
+Run from the repository root with:
+    python -m benchmarks.bench_cohort
+"""
+import os
+import time
+import random
+import asyncio
+
+import numpy as np
+
+from benchmarks.common import start_fake_upstream, stop, use_fake_upstream
+
+USERS = int(os.getenv("BENCH_USERS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "64"))
+use_fake_upstream()
+
+from app.cohort import cohort_recommendations
+from app.energy import energy_budgets
+from app.get_personalized_recommendations import calculate_remaining_calories, get_personalized_recommendations
+from app.recommendation_cache import recommendation_cache
+from app.usage import usage_totals
+
+CONDITIONS = ["diabetes", "high blood pressure", "high cholesterol"]
+
+def make_users(rng: random.Random) -> list:
+    return [
+        {
+            "id": index,
+            "food_totals": {"calories": rng.randrange(200, 1200), "carbs": rng.randrange(20, 150),
+                            "protein": rng.randrange(10, 60), "fats": rng.randrange(5, 50),
+                            "sodium": rng.randrange(300, 2000)},
+            "user_profile": {"age": rng.randrange(22, 65), "weight": rng.randrange(48, 110),
+                             "height": rng.randrange(150, 195), "stepsPerDay": rng.randrange(2000, 15000),
+                             "sex": rng.choice(["male", "female"]),
+                             "medicalConditions": [rng.choice(CONDITIONS)] if rng.random() < 0.2 else []},
+        }
+        for index in range(USERS)
+    ]
+
+def upstream_calls() -> int:
+    return sum(endpoint["calls"] for endpoint in usage_totals.values())
+
+async def per_user(users: list) -> tuple:
+    slots = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(user: dict):
+        async with slots:
+            return await get_personalized_recommendations(user["food_totals"], user["user_profile"], "12:30 PM",
+                                                          track_traffic=False)
+
+    results = await asyncio.gather(*(one(user) for user in users))
+    return sum(1 for result in results if "error" not in result)
+
+async def cohort(users: list) -> tuple:
+    output = await cohort_recommendations(users, "12:30 PM")
+    print(f"  cohort stats: {output['stats']}")
+    return sum(1 for result in output["results"] if "error" not in result)
+
+async def compare(label: str, run, users: list):
+    recommendation_cache._entries.clear()
+    calls = upstream_calls()
+    start = time.perf_counter()
+    succeeded = await run(users)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {succeeded:>9} {upstream_calls() - calls:>9} {elapsed:>8.2f} {len(users) / elapsed:>10.0f}")
+
+def time_budgets(users: list):
+    start = time.perf_counter()
+    for user in users:
+        calculate_remaining_calories(user["food_totals"], user["user_profile"])
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    consumed = np.array([float(user["food_totals"]["calories"]) for user in users])
+    energy_budgets([user["user_profile"] for user in users], consumed)
+    vectorized = time.perf_counter() - start
+    print(f"energy budgets for {len(users)} users: per user {scalar * 1000:.1f} ms, vectorized {vectorized * 1000:.1f} ms")
+
+async def main():
+    users = make_users(random.Random(11))
+    time_budgets(users)
+    print(f"{'mode':<10} {'succeeded':>9} {'upstream':>9} {'wall s':>8} {'users/s':>10}")
+    await compare("per user", per_user, users)
+    await compare("cohort", cohort, users)
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0.3")
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
@@ -0,0 +1,90 @@
+"""
+Measures /recommend throughput at increasing client concurrency against the fake upstream.
+
+Starts benchmarks.fake_upstream on a local port, points the shared OpenAI client at it,
+and drives the FastAPI app in-process. With non-blocking upstream calls, throughput
+should grow roughly linearly with concurrency until UPSTREAM_CONCURRENCY is reached.
+Every request has a different intake and the recommendation cache is disabled, so each
+one makes its own upstream call instead of being served from cache or coalesced.
+
+Each level sends BENCH_ROUNDS requests per client, so throughput is measured in steady
+state rather than over a single burst. Besides req/s it reports the mean number of
+requests the clients have in flight (total latency over wall time) and the CPU time this
+process spent per request. The app and the OpenAI client share this process, so once CPU
+time per request times req/s approaches a full core, more concurrency only adds latency:
+the extra requests wait for the event loop, not for the upstream.
+
+Run from the repository root with:
+    python -m benchmarks.bench_concurrency
+"""
+import os
+import time
+import asyncio
+
+from benchmarks.common import start_fake_upstream, stop, use_fake_upstream
+
+LEVELS = [int(n) for n in os.getenv("BENCH_CONCURRENCY", "1,8,32,128,256").split(",")]
+# Requests per client at each level, so the top level runs several times its concurrency.
+# BENCH_REQUESTS sends that fixed number of requests at every level instead.
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "4"))
+MIN_REQUESTS = 32
+REQUESTS_PER_LEVEL = int(os.getenv("BENCH_REQUESTS", "0"))
+
+use_fake_upstream()
+# Every benchmark request comes from one client, so per-client rate limiting is off.
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+os.environ.setdefault("RECOMMENDATION_CACHE_SIZE", "0")
+
+import httpx
+from app.main import app
+
+def payload(index: int) -> dict:
+    return {
+        "food_totals": {"calories": 1200 + index, "carbs": 150, "protein": 60, "fats": 40, "sodium": 2000},
+        "user_profile": {"age": 30, "weight": 70, "height": 175, "dailyCalorieTarget": 2000},
+        "current_time": "12:30 PM",
+    }
+
+def requests_for(concurrency: int) -> int:
+    return REQUESTS_PER_LEVEL or max(MIN_REQUESTS, ROUNDS * concurrency)
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, offset: int) -> tuple:
+    """
+    Returns (req/s, mean requests in flight, CPU ms per request) for one concurrency level.
+    """
+    requests = requests_for(concurrency)
+    remaining = requests
+    busy = 0.0
+
+    async def worker():
+        nonlocal remaining, busy
+        while remaining > 0:
+            remaining -= 1
+            sent = time.perf_counter()
+            response = await client.post("/recommend", json=payload(offset + remaining))
+            response.raise_for_status()
+            busy += time.perf_counter() - sent
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - start
+    return requests / wall, busy / wall, cpu / requests * 1000
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'concurrency':>12} {'requests':>9} {'req/s':>10} {'in flight':>10} {'cpu ms/req':>11}")
+        offset = 0
+        for level in LEVELS:
+            rate, in_flight, cpu_ms = await run_level(client, level, offset)
+            print(f"{level:>12} {requests_for(level):>9} {rate:>10.1f} {in_flight:>10.1f} {cpu_ms:>11.2f}")
+            offset += requests_for(level)
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream()
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
@@ -0,0 +1,65 @@
+"""
+Compares peak Python memory of the old disk-based upload ingestion with the
+in-memory path in app.uploads, from an upload spooled in memory as Starlette stores it.
+The in-memory path holds the raw bytes while they are Base64-encoded (they are also needed
+for hashing and preprocessing), so its peak is about one upload size above the disk path,
+which kept them on disk; what it saves is the disk write and read-back per request.
+
+Run from the repository root with:
+    python -m benchmarks.bench_ingest_memory
+"""
+import os
+import base64
+import shutil
+import asyncio
+import tempfile
+import tracemalloc
+from starlette.datastructures import UploadFile
+from app.uploads import encode_image_bytes, read_upload
+
+SIZES_MB = [1, 4, 8]
+
+def make_upload(data: bytes) -> UploadFile:
+    # Spooled in memory, as Starlette stores multipart parts below spool_max_size.
+    spooled = tempfile.SpooledTemporaryFile(max_size=len(data) + 1)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename="dish.jpg", size=len(data))
+
+def disk_ingest(upload: UploadFile, directory: str) -> str:
+    # The previous /analyze path: copy to uploads/, read back and encode.
+    file_path = os.path.join(directory, "upload.jpg")
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(upload.file, buffer)
+    with open(file_path, "rb") as image_file:
+        encoded = base64.b64encode(image_file.read()).decode("utf-8")
+    os.remove(file_path)
+    return encoded
+
+async def memory_ingest(upload: UploadFile, max_bytes: int) -> str:
+    return encode_image_bytes(await read_upload(upload, max_bytes=max_bytes))
+
+def measure(fn) -> int:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    # Created before measuring, so the event loop's own allocations are not counted.
+    loop = asyncio.new_event_loop()
+    print(f"{'upload':>8} {'disk peak':>12} {'memory peak':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in SIZES_MB:
+            data = os.urandom(size_mb * 1024 * 1024)
+            # Uploads are built before measuring: both paths start from the same parsed body.
+            upload = make_upload(data)
+            disk_peak = measure(lambda: disk_ingest(upload, directory))
+            upload = make_upload(data)
+            stream_peak = measure(lambda: loop.run_until_complete(memory_ingest(upload, len(data))))
+            print(f"{size_mb:>6}MB {disk_peak / 2**20:>10.1f}MB {stream_peak / 2**20:>10.1f}MB")
+    loop.close()
+
+if __name__ == "__main__":
+    main()
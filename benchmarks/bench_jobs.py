@@ -0,0 +1,129 @@
+"""
+Compares /analyze with the /analyze/jobs API for clients on a flaky network.
+
+BENCH_CLIENTS clients each analyze a different image against a fake upstream taking
+about 1.5 s. Every HTTP request a client makes is abandoned after BENCH_CLIENT_TIMEOUT
+(1 s), as a mobile connection dropping would, and retried up to BENCH_ATTEMPTS times.
+With /analyze the whole round trip has to fit in one connection; with jobs the client
+submits, then either long-polls with wait below its timeout or polls every
+BENCH_POLL_INTERVAL (0.5 s) until the result is ready, with JOB_WORKERS (32) analyses
+running at once.
+
+Reports analyses that succeeded, HTTP requests made, total seconds connections were held
+open, upstream calls and time to result.
+
+Run from the repository root with:
+    python -m benchmarks.bench_jobs
+"""
+import io
+import os
+import time
+import random
+import asyncio
+
+import httpx
+from PIL import Image
+
+from benchmarks.common import percentile, start_fake_upstream, stop, use_fake_upstream
+
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "100"))
+CLIENT_TIMEOUT = float(os.getenv("BENCH_CLIENT_TIMEOUT", "1"))
+ATTEMPTS = int(os.getenv("BENCH_ATTEMPTS", "5"))
+POLL_INTERVAL = float(os.getenv("BENCH_POLL_INTERVAL", "0.5"))
+use_fake_upstream()
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+os.environ.setdefault("JOB_WORKERS", "32")
+
+from app.main import app
+from app.usage import usage_totals
+
+def noise_image(seed: int) -> bytes:
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (64, 64), bytes(rng.randrange(256) for _ in range(64 * 64 * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+class FlakyClient:
+    """
+    Sends requests that are abandoned after CLIENT_TIMEOUT, counting requests and open time.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.requests = 0
+        self.open_seconds = 0.0
+
+    async def request(self, method: str, url: str, **kwargs):
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(self.client.request(method, url, **kwargs), CLIENT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.open_seconds += time.perf_counter() - start
+
+async def sync_analyze(flaky: FlakyClient, image: bytes) -> bool:
+    for _ in range(ATTEMPTS):
+        response = await flaky.request("POST", "/analyze", files={"file": ("meal.jpg", image, "image/jpeg")})
+        if response is not None and response.status_code == 200:
+            return True
+    return False
+
+async def job_analyze(flaky: FlakyClient, image: bytes, wait: float) -> bool:
+    # Only dropped or failed requests use up attempts; polls that find the job pending do not.
+    job_id = None
+    failures = 0
+    while failures < ATTEMPTS:
+        if job_id is None:
+            response = await flaky.request("POST", "/analyze/jobs", files={"file": ("meal.jpg", image, "image/jpeg")})
+        else:
+            if wait == 0:
+                await asyncio.sleep(POLL_INTERVAL)
+            response = await flaky.request("GET", f"/analyze/jobs/{job_id}", params={"wait": wait})
+        if response is None or response.status_code >= 400:
+            failures += 1
+            continue
+        job = response.json()
+        job_id = job["job_id"]
+        if job["status"] == "done":
+            return True
+        if job["status"] == "failed":
+            failures += 1
+            job_id = None
+    return False
+
+async def run(label: str, analyze, seed: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        flaky = FlakyClient(client)
+        calls = usage_totals["analyze"]["calls"]
+        durations = []
+
+        async def one(index: int) -> bool:
+            start = time.perf_counter()
+            ok = await analyze(flaky, noise_image(seed + index))
+            if ok:
+                durations.append(time.perf_counter() - start)
+            return ok
+
+        results = await asyncio.gather(*(one(index) for index in range(CLIENTS)))
+        print(f"{label:<10} {sum(results):>9} {flaky.requests:>9} {flaky.open_seconds:>9.0f} "
+              f"{usage_totals['analyze']['calls'] - calls:>9} {percentile(durations, 0.5):>9.2f} "
+              f"{percentile(durations, 0.99):>9.2f}")
+
+async def main():
+    print(f"{'api':<10} {'succeeded':>9} {'requests':>9} {'open s':>9} {'upstream':>9} {'p50 s':>9} {'p99 s':>9}")
+    # Different seeds so the second run cannot reuse the first run's cached analyses.
+    await run("/analyze", sync_analyze, 0)
+    await run("long-poll", lambda flaky, image: job_analyze(flaky, image, CLIENT_TIMEOUT * 0.8), 100_000)
+    await run("poll", lambda flaky, image: job_analyze(flaky, image, 0), 200_000)
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="1.5", FAKE_UPSTREAM_LATENCY_DIST="lognormal",
+                                   FAKE_UPSTREAM_LATENCY_SPREAD="0.3")
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
@@ -0,0 +1,63 @@
+"""
+Microbenchmark of per-request JSON parse and serialize cost.
+
+Compares the removed global json.loads patch (strip, fence check and brace balancing
+around the standard library) with app.llm_output.parse_llm_json, and Starlette's
+JSONResponse rendering with app.responses.FastJSONResponse.
+
+Run from the repository root with:
+    python -m benchmarks.bench_json
+"""
+import json
+import timeit
+from fastapi.responses import JSONResponse
+from app.llm_output import orjson, parse_llm_json
+from app.responses import FastJSONResponse
+
+RECOMMENDATIONS = {
+    "recommendations": [
+        {
+            "food": f"Dish {i} (reduced portion)",
+            "estimatedNutrition": {"calories": 400 + i, "carbs": 45, "protein": 22, "fats": 14, "sodium": 1300},
+            "explanation": "A balanced option that leaves enough of the remaining calorie budget for dinner. " * 3,
+            "remainingAfter": 400 - i,
+        }
+        for i in range(5)
+    ]
+}
+RAW = json.dumps(RECOMMENDATIONS, indent=2)
+FENCED = f"```json\n{RAW}\n```"
+NUMBER = 20000
+
+def old_parse(s: str):
+    # The previous path: debug_json_loads around clean_json_string and balance_braces.
+    s = s.strip()
+    if s.startswith("```json"):
+        s = s[len("```json"):].strip()
+    if s.startswith("```"):
+        s = s[3:].strip()
+    if s.endswith("```"):
+        s = s[:-3].strip()
+    while s.count("{") > s.count("}"):
+        s += "}"
+    s = s.strip()
+    return json.loads(s)
+
+def per_call_us(fn) -> float:
+    return timeit.timeit(fn, number=NUMBER) / NUMBER * 1e6
+
+def main():
+    print(f"orjson available: {orjson is not None}; payload {len(RAW)} chars")
+    rows = [
+        ("parse plain, old", lambda: old_parse(RAW)),
+        ("parse plain, new", lambda: parse_llm_json(RAW)),
+        ("parse fenced, old", lambda: old_parse(FENCED)),
+        ("parse fenced, new", lambda: parse_llm_json(FENCED)),
+        ("serialize, JSONResponse", lambda: JSONResponse(RECOMMENDATIONS).body),
+        ("serialize, FastJSONResponse", lambda: FastJSONResponse(RECOMMENDATIONS).body),
+    ]
+    for label, fn in rows:
+        print(f"{label:<30} {per_call_us(fn):8.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Load-tests /analyze and /recommend at increasing concurrency against the fake upstream.
+
+Starts benchmarks.fake_upstream and the app under uvicorn, drives each endpoint with
+BENCH_REQUESTS requests per concurrency level, and reports throughput, p50/p95/p99 latency,
+failed requests and the app process's resident and peak memory. Every /analyze request
+uploads a different random image and every /recommend request a different intake, so
+coalescing never applies; the image and recommendation caches are disabled unless
+BENCH_CACHES=1, so the numbers measure the uncached hot path.
+
+The upstream defaults to lognormal latency around 0.3 s with 1% errors, 20% fenced and
+1% truncated answers; any FAKE_UPSTREAM_* variable set in the environment overrides them.
+With BENCH_OUTPUT set, the results are also written there as JSON for comparing runs.
+
+Run from the repository root with:
+    python -m benchmarks.bench_load
+"""
+import io
+import os
+import json
+import time
+import random
+import asyncio
+
+import httpx
+from PIL import Image
+
+from benchmarks.common import APP_PORT, percentile, start_app, start_fake_upstream, stop
+
+LEVELS = [int(n) for n in os.getenv("BENCH_CONCURRENCY", "1,8,32,128").split(",")]
+REQUESTS_PER_LEVEL = int(os.getenv("BENCH_REQUESTS", "200"))
+ENDPOINTS = os.getenv("BENCH_ENDPOINTS", "analyze,recommend").split(",")
+CACHES = os.getenv("BENCH_CACHES") == "1"
+OUTPUT = os.getenv("BENCH_OUTPUT", "")
+
+UPSTREAM_DEFAULTS = {
+    "FAKE_UPSTREAM_LATENCY": "0.3",
+    "FAKE_UPSTREAM_LATENCY_DIST": "lognormal",
+    "FAKE_UPSTREAM_LATENCY_SPREAD": "0.4",
+    "FAKE_UPSTREAM_ERROR_RATE": "0.01",
+    "FAKE_UPSTREAM_FENCED_RATE": "0.2",
+    "FAKE_UPSTREAM_TRUNCATED_RATE": "0.01",
+}
+
+def process_memory_mb(pid: int) -> tuple:
+    """
+    Returns (resident, peak resident) memory of a process in MB, read from /proc (Linux only).
+    """
+    fields = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            name, _, value = line.partition(":")
+            fields[name] = value
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+
+def random_jpeg() -> bytes:
+    """
+    A small noise image, so each upload has its own perceptual hash.
+    """
+    image = Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def analyze_request(index: int) -> dict:
+    return {"files": {"file": (f"meal-{index}.jpg", random_jpeg(), "image/jpeg")}}
+
+def recommend_request(index: int) -> dict:
+    calories = 600 + index % 1200
+    return {"json": {
+        "food_totals": {"calories": calories, "carbs": 150, "protein": 60, "fats": 40, "sodium": 2000},
+        "user_profile": {"age": 30, "weight": 70, "height": 175, "dailyCalorieTarget": 2000 + index},
+        "current_time": random.choice(["08:00 AM", "12:30 PM", "07:00 PM", "11:00 PM"]),
+    }}
+
+REQUEST_BUILDERS = {"analyze": analyze_request, "recommend": recommend_request}
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, server_pid: int) -> dict:
+    requests = [REQUEST_BUILDERS[endpoint](index) for index in range(REQUESTS_PER_LEVEL)]
+    latencies = []
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        while requests:
+            request = requests.pop()
+            start = time.perf_counter()
+            response = await client.post(f"/{endpoint}", **request)
+            latencies.append(time.perf_counter() - start)
+            failed += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    rss, peak = process_memory_mb(server_pid)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": REQUESTS_PER_LEVEL,
+        "failed": failed,
+        "throughput": REQUESTS_PER_LEVEL / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rss_mb": rss,
+        "peak_rss_mb": peak,
+    }
+
+async def main(server_pid: int):
+    limits = httpx.Limits(max_connections=max(LEVELS), max_keepalive_connections=max(LEVELS))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=None, limits=limits) as client:
+        results = []
+        print(f"{'endpoint':<10} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'failed':>7} {'rss MB':>7} {'peak MB':>8}")
+        for endpoint in ENDPOINTS:
+            for level in LEVELS:
+                result = await run_level(client, endpoint, level, server_pid)
+                results.append(result)
+                print(f"{endpoint:<10} {level:>5} {result['throughput']:>8.1f} {result['p50_ms']:>8.0f} "
+                      f"{result['p95_ms']:>8.0f} {result['p99_ms']:>8.0f} {result['failed']:>7} "
+                      f"{result['rss_mb']:>7.1f} {result['peak_rss_mb']:>8.1f}")
+        stats = (await client.get("/stats")).json()
+    if OUTPUT:
+        with open(OUTPUT, "w") as output:
+            json.dump({"results": results, "stats": stats}, output, indent=2)
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(**{**UPSTREAM_DEFAULTS, **os.environ})
+    # Every benchmark request comes from one client, so per-client rate limiting is off.
+    app_settings = {"RATE_LIMIT_PER_MINUTE": os.getenv("RATE_LIMIT_PER_MINUTE", "0")}
+    if not CACHES:
+        app_settings.update({"IMAGE_CACHE_SIZE": "0", "RECOMMENDATION_CACHE_SIZE": "0"})
+    try:
+        server = start_app(**app_settings)
+    except RuntimeError:
+        stop(upstream)
+        raise
+    try:
+        asyncio.run(main(server.pid))
+    finally:
+        stop(server, upstream)
@@ -0,0 +1,88 @@
+"""
+Compares payload size, estimated vision tokens and end-to-end latency of get_food_info
+for several preprocessing settings, against the fake upstream with no added latency.
+
+The sample set is synthetic (a 12 MP phone-sized JPEG, a 1080p PNG and a small JPEG),
+so byte counts are indicative rather than exact for real food photos.
+
+Run from the repository root with:
+    python -m benchmarks.bench_preprocess
+"""
+import io
+import math
+import time
+import asyncio
+
+from benchmarks.common import start_fake_upstream, stop, use_fake_upstream
+
+use_fake_upstream()
+
+from PIL import Image, ImageDraw, ImageFilter
+from app.get_food_info import get_food_info
+from app.image_preprocessing import preprocess_image
+from app.uploads import encode_image_bytes
+
+# (label, max_edge, quality, detail); max_edge None sends the original upload.
+SETTINGS = [
+    ("original", None, None, "high"),
+    ("2048/q85/high", 2048, 85, "high"),
+    ("1024/q85/auto", 1024, 85, "auto"),
+    ("768/q80/auto", 768, 80, "auto"),
+    ("512/q75/auto", 512, 75, "auto"),
+]
+
+def sample_image(width: int, height: int, fmt: str) -> bytes:
+    image = Image.new("RGB", (width, height), (235, 225, 200))
+    draw = ImageDraw.Draw(image)
+    for i in range(40):
+        x = (i * 7919) % width
+        y = (i * 104729) % height
+        r = max(width, height) // 12
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=((i * 53) % 255, (i * 97) % 255, (i * 31) % 255))
+    image = image.filter(ImageFilter.GaussianBlur(3)).effect_spread(2)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=92) if fmt == "JPEG" else image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+def vision_tokens(width: int, height: int, detail: str) -> int:
+    # GPT-4o image pricing: 85 tokens at low detail; at high detail the image is fit into
+    # 2048x2048, its short side scaled to 768, and each 512px tile costs 170 tokens.
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+async def main():
+    samples = [
+        ("phone 4032x3024 jpeg", sample_image(4032, 3024, "JPEG")),
+        ("screen 1920x1080 png", sample_image(1920, 1080, "PNG")),
+        ("small 640x480 jpeg", sample_image(640, 480, "JPEG")),
+    ]
+    print(f"{'sample':<22} {'setting':<15} {'bytes sent':>11} {'tokens':>7} {'prep ms':>8} {'e2e ms':>8}")
+    for name, data in samples:
+        for label, max_edge, quality, detail in SETTINGS:
+            start = time.perf_counter()
+            if max_edge is None:
+                payload = data
+                with Image.open(io.BytesIO(data)) as image:
+                    size = image.size
+            else:
+                payload, detail, _ = preprocess_image(data, max_edge=max_edge, quality=quality, detail=detail)
+                with Image.open(io.BytesIO(payload)) as image:
+                    size = image.size
+            prep_ms = (time.perf_counter() - start) * 1000
+            image_base64 = encode_image_bytes(payload)
+            await get_food_info(image_base64, detail="low" if detail == "low" else "high")
+            e2e_ms = (time.perf_counter() - start) * 1000
+            tokens = vision_tokens(*size, detail)
+            print(f"{name:<22} {label:<15} {len(image_base64):>11} {tokens:>7} {prep_ms:>8.1f} {e2e_ms:>8.1f}")
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0")
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
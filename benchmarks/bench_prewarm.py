@@ -0,0 +1,87 @@
+"""
+Measures the recommendation cache hit rate of a lunch rush with and without pre-warming.
+
+A population of BENCH_USERS profiles makes requests with Zipf-distributed popularity.
+"Yesterday's" lunch traffic is replayed to fill the traffic history, then the cache is
+emptied as if its entries had expired overnight. Today's rush (BENCH_REQUESTS requests
+drawn from the same distribution) is replayed once cold and once after prewarm_window
+has spent PREWARM_MAX_CALLS upstream calls, against the fake upstream.
+
+Run from the repository root with:
+    python -m benchmarks.bench_prewarm
+"""
+import os
+import random
+import asyncio
+import datetime
+
+from benchmarks.common import start_fake_upstream, stop, use_fake_upstream
+
+USERS = int(os.getenv("BENCH_USERS", "400"))
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "1000"))
+BUDGET = int(os.getenv("PREWARM_MAX_CALLS", "50"))
+use_fake_upstream()
+os.environ.setdefault("MODEL_ROUTE_RECOMMEND", "gpt-4o")
+
+from app.get_personalized_recommendations import get_personalized_recommendations
+from app.prewarm import prewarm_window
+from app.recommendation_cache import recent_traffic, recommendation_cache
+from app.usage import usage_totals
+
+CONDITIONS = [[], [], [], ["diabetes"], ["high blood pressure"], ["high cholesterol"]]
+
+def make_users(rng: random.Random) -> list:
+    return [
+        (
+            {"calories": rng.choice([300, 400, 500, 600]), "carbs": 60, "protein": 20, "fats": 15, "sodium": 800},
+            {
+                "age": rng.choice([25, 35, 45, 55]),
+                "weight": rng.choice([55, 65, 75, 85]),
+                "height": rng.choice([160, 170, 180]),
+                "dailyCalorieTarget": rng.choice([1600, 1800, 2000, 2200]),
+                "medicalConditions": rng.choice(CONDITIONS),
+            },
+        )
+        for _ in range(USERS)
+    ]
+
+def draw(rng: random.Random, users: list, weights: list) -> list:
+    return rng.choices(users, weights=weights, k=REQUESTS)
+
+async def replay(requests: list) -> float:
+    """
+    Sends the requests in order and returns the fraction answered without an upstream call.
+    """
+    before = usage_totals["recommend"]["calls"]
+    for food_totals, user_profile in requests:
+        await get_personalized_recommendations(food_totals, user_profile, "12:30 PM")
+    return 1 - (usage_totals["recommend"]["calls"] - before) / len(requests)
+
+async def main():
+    rng = random.Random(7)
+    users = make_users(rng)
+    weights = [1 / (rank + 1) for rank in range(USERS)]
+    yesterday, today = draw(rng, users, weights), draw(rng, users, weights)
+
+    await replay(yesterday)
+    distinct = len(recent_traffic)
+    recommendation_cache._entries.clear()
+    cold = await replay(today)
+
+    recommendation_cache._entries.clear()
+    calls = usage_totals["recommend"]["calls"]
+    result = await prewarm_window("lunch", datetime.datetime.combine(datetime.date.today(), datetime.time(11, 0)), BUDGET)
+    spent = usage_totals["recommend"]["calls"] - calls
+    warm = await replay(today)
+
+    print(f"distinct cache keys in yesterday's lunch traffic: {distinct}")
+    print(f"pre-warm: {result}, upstream calls spent: {spent}")
+    print(f"today's hit rate, cold cache:   {cold:.1%}")
+    print(f"today's hit rate, after warmup: {warm:.1%}")
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0.01")
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
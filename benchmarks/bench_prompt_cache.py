@@ -0,0 +1,87 @@
+"""
+Reports how much of the /recommend prompt is a shared, cacheable prefix before and after
+moving the fixed instructions into a leading system message.
+
+Offline, tokens are estimated at four characters per token over a set of varied requests.
+The "before" layout is the previous single user message, reconstructed as the
+per-request text followed by the fixed block. OpenAI caches prompt prefixes of at least
+1024 tokens, in 128-token steps.
+
+With BENCH_LIVE=1 the requests are also sent to the configured API (OPENAI_API_KEY and
+optionally OPENAI_BASE_URL), and prompt tokens, cached tokens and latency are reported
+for both layouts.
+
+Run from the repository root with:
+    python -m benchmarks.bench_prompt_cache
+"""
+import os
+import json
+import time
+import asyncio
+from app.get_personalized_recommendations import (
+    RECOMMENDATION_COMPLETION_PARAMS,
+    build_recommendation_messages,
+    calculate_remaining_calories,
+    determine_meal_context,
+    summarize_user_profile,
+)
+from app.openai_client import create_chat_completion
+
+REQUESTS = [
+    ({"calories": calories, "carbs": 120, "protein": 50, "fats": 40, "sodium": 1800},
+     {"age": age, "weight": 70, "height": 170, "dailyCalorieTarget": 2000}, current_time)
+    for calories, age, current_time in [
+        (400, 25, "08:15 AM"), (900, 34, "12:30 PM"), (1300, 41, "01:10 PM"),
+        (1500, 29, "06:45 PM"), (1800, 52, "10:30 PM"), (700, 38, "11:55 AM"),
+    ]
+]
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+def layouts(food_totals, user_profile, current_time) -> dict:
+    messages = build_recommendation_messages(
+        current_time,
+        determine_meal_context(current_time),
+        summarize_user_profile(user_profile),
+        food_totals,
+        calculate_remaining_calories(food_totals, user_profile),
+    )
+    system_text = messages[0]["content"]
+    user_text = messages[1]["content"][0]["text"]
+    before = [{"role": "user", "content": [{"type": "text", "text": f"{user_text} {system_text}"}]}]
+    return {"before": before, "after": messages}
+
+def shared_prefix_chars(serialized: list) -> int:
+    return len(os.path.commonprefix(serialized))
+
+async def live(name: str, all_messages: list):
+    prompt_tokens = cached_tokens = 0
+    latencies = []
+    for messages in all_messages:
+        start = time.perf_counter()
+        completion = await create_chat_completion(messages=messages, **RECOMMENDATION_COMPLETION_PARAMS)
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens += completion.usage.prompt_tokens
+        details = completion.usage.prompt_tokens_details
+        cached_tokens += (details.cached_tokens or 0) if details else 0
+    latencies.sort()
+    print(f"{name:<7} prompt tokens {prompt_tokens:>6}  cached {cached_tokens:>6}  "
+          f"p50 latency {latencies[len(latencies) // 2] * 1000:7.0f} ms")
+
+def main():
+    per_layout = {"before": [], "after": []}
+    for request in REQUESTS:
+        for name, messages in layouts(*request).items():
+            per_layout[name].append(messages)
+    for name, all_messages in per_layout.items():
+        serialized = [json.dumps(messages) for messages in all_messages]
+        total = sum(estimate_tokens(text) for text in serialized) // len(serialized)
+        prefix = estimate_tokens(serialized[0][:shared_prefix_chars(serialized)])
+        print(f"{name:<7} ~{total} prompt tokens per request, ~{prefix} shared across requests")
+    if os.getenv("BENCH_LIVE") == "1":
+        for name, all_messages in per_layout.items():
+            asyncio.run(live(name, all_messages))
+
+if __name__ == "__main__":
+    main()
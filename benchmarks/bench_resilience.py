@@ -0,0 +1,86 @@
+"""
+Checks the upstream resilience layer against the fake upstream in three scenarios:
+
+- slow tail: 3% of calls stall for 3 s; p50/p95/p99 with hedging off and on.
+- errors: 10% of calls fail with a 500; failed requests with 0 and 2 retries.
+- outage: every call fails; time per call before and after the circuit opens.
+
+Run from the repository root with:
+    python -m benchmarks.bench_resilience
+"""
+import os
+import time
+import asyncio
+
+from benchmarks.common import percentile, start_fake_upstream, stop, use_fake_upstream
+
+CALLS = int(os.getenv("BENCH_CALLS", "600"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+use_fake_upstream()
+
+from app import resilience
+from app.openai_client import create_chat_completion
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+def reset(hedging: bool, retries: int):
+    resilience.UPSTREAM_HEDGING = hedging
+    resilience.UPSTREAM_RETRIES = retries
+    resilience.latency_trackers.clear()
+    resilience.circuit_breakers.clear()
+
+async def drive(calls: int, concurrency: int) -> tuple:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with slots:
+            start = time.perf_counter()
+            try:
+                await create_chat_completion(endpoint="bench", model="gpt-4o", messages=MESSAGES)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+def report(label: str, latencies: list, failures: int):
+    print(f"{label:<24} {percentile(latencies, 0.5) * 1000:>8.0f} {percentile(latencies, 0.95) * 1000:>8.0f} "
+          f"{percentile(latencies, 0.99) * 1000:>8.0f} {failures:>8}")
+
+async def slow_tail():
+    for hedging in (False, True):
+        reset(hedging=hedging, retries=2)
+        # Warm the latency window so the hedge delay is known before measuring.
+        await drive(50, CONCURRENCY)
+        report(f"slow tail, hedging {'on' if hedging else 'off'}", *await drive(CALLS, CONCURRENCY))
+
+async def errors():
+    for retries in (0, 2):
+        reset(hedging=False, retries=retries)
+        report(f"10% errors, {retries} retries", *await drive(CALLS, CONCURRENCY))
+
+async def outage():
+    reset(hedging=False, retries=2)
+    for label in ("outage, circuit closing", "outage, circuit open"):
+        report(label, *await drive(10, 1))
+
+async def run(scenario, **settings):
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY="0.2", FAKE_UPSTREAM_LATENCY_DIST="lognormal",
+                                   FAKE_UPSTREAM_LATENCY_SPREAD="0.2", **settings)
+    try:
+        await scenario()
+    finally:
+        stop(upstream)
+
+async def main():
+    print(f"{'scenario':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>8}")
+    await run(slow_tail, FAKE_UPSTREAM_SLOW_RATE="0.03", FAKE_UPSTREAM_SLOW_LATENCY="3")
+    await run(errors, FAKE_UPSTREAM_ERROR_RATE="0.1")
+    await run(outage, FAKE_UPSTREAM_ERROR_RATE="1")
+
+if __name__ == "__main__":
+    asyncio.run(main())
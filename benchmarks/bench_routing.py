@@ -0,0 +1,63 @@
+"""
+Compares latency and escalations of get_food_info with a single gpt-4o tier and with the
+tiered gpt-4o-mini -> gpt-4o route.
+
+The fake upstream simulates both tiers: gpt-4o-mini answers in 0.15 s but returns truncated
+JSON or an unknown dish 20% of the time (FAKE_UPSTREAM_WEAK_FAILURE_RATE), gpt-4o answers
+correctly in 0.5 s.
+
+Run from the repository root with:
+    python -m benchmarks.bench_routing
+"""
+import os
+import time
+import asyncio
+
+from benchmarks.common import percentile, start_fake_upstream, stop, use_fake_upstream
+
+CALLS = int(os.getenv("BENCH_CALLS", "200"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+use_fake_upstream()
+
+from app.get_food_info import get_food_info
+from app.model_router import route_stats
+from app.uploads import encode_image_bytes
+
+async def run(route: str, image_base64: str):
+    os.environ["MODEL_ROUTE_ANALYZE"] = route
+    route_stats.clear()
+    slots = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            result = await get_food_info(image_base64, detail="low", mode="compact")
+            latencies.append(time.perf_counter() - start)
+            errors += "error" in result
+
+    await asyncio.gather(*(one() for _ in range(CALLS)))
+    first = route_stats[("analyze", route.split(",")[0])]
+    print(
+        f"{route:<20} {percentile(latencies, 0.5) * 1000:>8.0f} {percentile(latencies, 0.95) * 1000:>8.0f} "
+        f"{sum(latencies) / len(latencies) * 1000:>8.0f} {first['accepted']:>9} {first['escalated']:>9} {errors:>7}"
+    )
+
+async def main():
+    image_base64 = encode_image_bytes(b"\xff\xd8fake")
+    print(f"{'route':<20} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'tier1 ok':>9} {'escalated':>9} {'errors':>7}")
+    for route in ("gpt-4o", "gpt-4o-mini,gpt-4o"):
+        await run(route, image_base64)
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(
+        FAKE_UPSTREAM_MODEL_LATENCY="gpt-4o-mini=0.15,gpt-4o=0.5",
+        FAKE_UPSTREAM_WEAK_MODELS="gpt-4o-mini",
+        FAKE_UPSTREAM_WEAK_FAILURE_RATE="0.2",
+    )
+    try:
+        asyncio.run(main())
+    finally:
+        stop(upstream)
@@ -0,0 +1,53 @@
+"""
+Compares time to first recommendation for /recommend and /recommend/stream against the
+fake upstream, which streams its canned five-item answer over FAKE_UPSTREAM_LATENCY seconds.
+The app runs under uvicorn because httpx's in-process ASGI transport buffers responses.
+
+Run from the repository root with:
+    python -m benchmarks.bench_stream
+"""
+import os
+import json
+import time
+import asyncio
+
+import httpx
+
+from benchmarks.common import APP_PORT, start_app, start_fake_upstream, stop
+
+PAYLOAD = {
+    "food_totals": {"calories": 1200, "carbs": 150, "protein": 60, "fats": 40, "sodium": 2000},
+    "user_profile": {"age": 30, "weight": 70, "height": 175, "dailyCalorieTarget": 2000},
+    "current_time": "12:30 PM",
+}
+
+async def main():
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=None) as client:
+        # The two runs use different budgets so the second is not a recommendation cache hit.
+        start = time.perf_counter()
+        response = await client.post("/recommend", json=PAYLOAD)
+        count = len(response.json()["recommendations"])
+        buffered = time.perf_counter() - start
+        print(f"/recommend         first and all {count} items: {buffered * 1000:7.1f} ms")
+
+        payload = dict(PAYLOAD, food_totals=dict(PAYLOAD["food_totals"], calories=900))
+        start = time.perf_counter()
+        async with client.stream("POST", "/recommend/stream", json=payload) as response:
+            index = 0
+            async for line in response.aiter_lines():
+                if line:
+                    index += 1
+                    json.loads(line)
+                    print(f"/recommend/stream  item {index}: {(time.perf_counter() - start) * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    upstream = start_fake_upstream(FAKE_UPSTREAM_LATENCY=os.getenv("FAKE_UPSTREAM_LATENCY", "2.0"))
+    try:
+        server = start_app()
+    except RuntimeError:
+        stop(upstream)
+        raise
+    try:
+        asyncio.run(main())
+    finally:
+        stop(server, upstream)
@@ -0,0 +1,79 @@
+"""
+Helpers shared by the benchmark scripts: starting the fake upstream and the app under
+uvicorn, pointing the in-process app at the fake upstream, and latency percentiles.
+"""
+import os
+import sys
+import time
+import subprocess
+
+import httpx
+
+PORT = int(os.getenv("FAKE_UPSTREAM_PORT", "8100"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8101"))
+UPSTREAM_URL = f"http://127.0.0.1:{PORT}/v1"
+# Seconds a started server has to accept connections.
+STARTUP_TIMEOUT = float(os.getenv("BENCH_STARTUP_TIMEOUT", "10"))
+
+def use_fake_upstream() -> None:
+    """
+    Points the OpenAI client at the fake upstream. Call it before importing app modules,
+    which read their configuration at import.
+    """
+    os.environ["OPENAI_BASE_URL"] = UPSTREAM_URL
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def wait_until_ready(process: subprocess.Popen, url: str) -> None:
+    """
+    Waits until url answers any HTTP response. Stops the process and raises RuntimeError if
+    it exits or does not answer within STARTUP_TIMEOUT.
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with status {process.returncode}")
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    stop(process)
+    raise RuntimeError(f"Server did not start: {url}")
+
+def start_fake_upstream(**settings) -> subprocess.Popen:
+    """
+    Starts benchmarks.fake_upstream on PORT with the FAKE_UPSTREAM_* settings given, on top
+    of the environment, and returns once it accepts requests.
+    """
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_upstream:app",
+         "--port", str(PORT), "--log-level", "warning"],
+        env={**os.environ, **settings},
+    )
+    wait_until_ready(upstream, f"http://127.0.0.1:{PORT}/")
+    return upstream
+
+def start_app(**settings) -> subprocess.Popen:
+    """
+    Starts app.main on APP_PORT against the fake upstream, with the settings given on top
+    of the environment, and returns once it accepts requests.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        env={**os.environ, **settings, "OPENAI_BASE_URL": UPSTREAM_URL,
+             "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-fake")},
+        stdout=subprocess.DEVNULL,
+    )
+    wait_until_ready(server, f"http://127.0.0.1:{APP_PORT}/stats")
+    return server
+
+def stop(*processes: subprocess.Popen) -> None:
+    for process in processes:
+        process.terminate()
+        process.wait()
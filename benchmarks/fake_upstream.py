@@ -0,0 +1,215 @@
+"""
+A minimal stand-in for the OpenAI chat completions API, used by the benchmarks.
+
+Every call sleeps for a latency drawn around FAKE_UPSTREAM_LATENCY seconds, plus
+FAKE_UPSTREAM_TOKEN_LATENCY seconds per generated token, and returns a canned response,
+so throughput numbers reflect how well the backend overlaps upstream calls. Requests that
+force a function call get arguments filled in from the function's JSON schema.
+Streaming requests receive the same content as server-sent events spread evenly over
+the same latency, like tokens being generated.
+
+Settings (environment variables):
+    FAKE_UPSTREAM_LATENCY           median latency in seconds (0.5)
+    FAKE_UPSTREAM_LATENCY_DIST      "fixed", "uniform" (median +/- spread) or "lognormal"
+                                    (median * e^N(0, spread)), default "fixed"
+    FAKE_UPSTREAM_LATENCY_SPREAD    spread of the distribution (0.5)
+    FAKE_UPSTREAM_SLOW_RATE         fraction of calls that stall instead (0)
+    FAKE_UPSTREAM_SLOW_LATENCY      latency of those stalled calls in seconds (5)
+    FAKE_UPSTREAM_TOKEN_LATENCY     extra seconds per generated token (0)
+    FAKE_UPSTREAM_MODEL_LATENCY     per-model median, e.g. "gpt-4o-mini=0.15,gpt-4o=0.5"
+    FAKE_UPSTREAM_ERROR_RATE        fraction of calls answered with an API error (0)
+    FAKE_UPSTREAM_ERROR_STATUS      HTTP status of those errors (500)
+    FAKE_UPSTREAM_FENCED_RATE       fraction of text answers wrapped in a ```json fence (0)
+    FAKE_UPSTREAM_TRUNCATED_RATE    fraction of answers cut off halfway through the JSON (0)
+    FAKE_UPSTREAM_CONTENT_FILE      file whose contents replace the canned text answer
+    FAKE_UPSTREAM_WEAK_MODELS       models that answer badly FAKE_UPSTREAM_WEAK_FAILURE_RATE
+                                    (0.2) of the time: half of those answers are truncated
+                                    JSON, the other half an unknown dish with low confidence
+
+Run with:
+    uvicorn benchmarks.fake_upstream:app --port 8100
+"""
+import os
+import json
+import math
+import time
+import random
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_UPSTREAM_LATENCY", "0.5"))
+LATENCY_DIST = os.getenv("FAKE_UPSTREAM_LATENCY_DIST", "fixed")
+LATENCY_SPREAD = float(os.getenv("FAKE_UPSTREAM_LATENCY_SPREAD", "0.5"))
+SLOW_RATE = float(os.getenv("FAKE_UPSTREAM_SLOW_RATE", "0"))
+SLOW_LATENCY = float(os.getenv("FAKE_UPSTREAM_SLOW_LATENCY", "5"))
+TOKEN_LATENCY = float(os.getenv("FAKE_UPSTREAM_TOKEN_LATENCY", "0"))
+MODEL_LATENCY = {
+    model.strip(): float(latency)
+    for model, _, latency in (
+        item.partition("=") for item in os.getenv("FAKE_UPSTREAM_MODEL_LATENCY", "").split(",") if item.strip()
+    )
+}
+ERROR_RATE = float(os.getenv("FAKE_UPSTREAM_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_UPSTREAM_ERROR_STATUS", "500"))
+FENCED_RATE = float(os.getenv("FAKE_UPSTREAM_FENCED_RATE", "0"))
+TRUNCATED_RATE = float(os.getenv("FAKE_UPSTREAM_TRUNCATED_RATE", "0"))
+CONTENT_FILE = os.getenv("FAKE_UPSTREAM_CONTENT_FILE", "")
+WEAK_MODELS = {model.strip() for model in os.getenv("FAKE_UPSTREAM_WEAK_MODELS", "").split(",") if model.strip()}
+WEAK_FAILURE_RATE = float(os.getenv("FAKE_UPSTREAM_WEAK_FAILURE_RATE", "0.2"))
+
+# Numbers returned for schema properties by name; anything else gets DEFAULT_NUMBER.
+SAMPLE_NUMBERS = {
+    "cal": 600, "calories": 600, "c": 75, "carbs": 75, "p": 25, "protein": 25,
+    "f": 20, "fats": 20, "na": 1200, "sodium": 1200, "conf": 0.9,
+}
+DEFAULT_NUMBER = 10
+
+# One answer that satisfies every text prompt: dish identification (verbose and flat),
+# nutrition, and recommendations.
+CANNED_CONTENT = json.dumps({
+    "name": "Chicken Rice",
+    "Dish Identification": {"name": "Chicken Rice", "portion_size": "1 plate"},
+    "Nutrition": {"calories": 600, "carbs": 75, "protein": 25, "fats": 20, "sodium": 1200},
+    "recommendations": [
+        {
+            "food": food,
+            "estimatedNutrition": {"calories": calories, "carbs": 30, "protein": 20, "fats": 12, "sodium": 1400},
+            "explanation": "Light and high in protein, leaving room in the remaining calorie budget.",
+            "remainingAfter": 800 - calories,
+        }
+        for food, calories in [
+            ("Yong Tau Foo (soup)", 350),
+            ("Sliced Fish Soup", 346),
+            ("Chicken Rice (less rice)", 500),
+            ("Thosai", 220),
+            ("Wanton Mee (soup)", 400),
+        ]
+    ],
+})
+if CONTENT_FILE:
+    with open(CONTENT_FILE, encoding="utf-8") as content_file:
+        CANNED_CONTENT = content_file.read()
+LOW_CONFIDENCE_CONTENT = CANNED_CONTENT.replace('"name": "Chicken Rice"', '"name": "Unknown"')
+STREAM_CHUNK_CHARS = 16
+
+app = FastAPI()
+
+def sample_latency(model: str) -> float:
+    """
+    Draws one call's base latency for the model from the configured distribution.
+    """
+    if random.random() < SLOW_RATE:
+        return SLOW_LATENCY
+    median = MODEL_LATENCY.get(model, LATENCY)
+    if LATENCY_DIST == "uniform":
+        return max(0.0, random.uniform(median * (1 - LATENCY_SPREAD), median * (1 + LATENCY_SPREAD)))
+    if LATENCY_DIST == "lognormal":
+        return median * math.exp(random.gauss(0, LATENCY_SPREAD))
+    return median
+
+def choose_failure(model: str):
+    """
+    Returns how this answer should be broken: None, "truncated" or "low_confidence".
+    """
+    if model in WEAK_MODELS and random.random() < WEAK_FAILURE_RATE:
+        return random.choice(("truncated", "low_confidence"))
+    if random.random() < TRUNCATED_RATE:
+        return "truncated"
+    return None
+
+def make_content(failure) -> str:
+    content = LOW_CONFIDENCE_CONTENT if failure == "low_confidence" else CANNED_CONTENT
+    if failure == "truncated":
+        content = content[:len(content) // 2]
+    if random.random() < FENCED_RATE:
+        content = f"```json\n{content}\n```"
+    return content
+
+def error_response() -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": "Simulated upstream failure", "type": "server_error", "code": None}},
+        status_code=ERROR_STATUS,
+    )
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o")
+    latency = sample_latency(model)
+    if random.random() < ERROR_RATE:
+        await asyncio.sleep(latency)
+        return error_response()
+    failure = choose_failure(model)
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(body, make_content(failure), latency), media_type="text/event-stream")
+    message = {"role": "assistant", "content": make_content(failure)}
+    function = forced_function(body)
+    if function is not None:
+        sample = sample_value(function.get("parameters", {}))
+        if failure == "low_confidence":
+            sample.update({key: value for key, value in (("n", "Unknown"), ("conf", 0.2)) if key in sample})
+        arguments = json.dumps(sample)
+        if failure == "truncated":
+            arguments = arguments[:len(arguments) // 2]
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": "call_fake",
+                "type": "function",
+                "function": {"name": function["name"], "arguments": arguments},
+            }],
+        }
+    generated = message["content"] or message["tool_calls"][0]["function"]["arguments"]
+    completion_tokens = min(len(generated) // 4, body.get("max_completion_tokens") or 4096)
+    await asyncio.sleep(latency + TOKEN_LATENCY * completion_tokens)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 500, "completion_tokens": completion_tokens, "total_tokens": 500 + completion_tokens},
+    }
+
+def forced_function(body: dict):
+    """
+    Returns the function definition the request forces via tool_choice, if any.
+    """
+    choice = body.get("tool_choice")
+    if not isinstance(choice, dict):
+        return None
+    for tool in body.get("tools", []):
+        if tool.get("function", {}).get("name") == choice.get("function", {}).get("name"):
+            return tool["function"]
+    return None
+
+def sample_value(schema: dict, name: str = None):
+    """
+    Builds a plausible value matching a JSON schema.
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: sample_value(prop, key) for key, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_value(schema.get("items", {}))]
+    if kind == "string":
+        return "Chicken Rice"
+    if kind == "boolean":
+        return True
+    return SAMPLE_NUMBERS.get(name, DEFAULT_NUMBER)
+
+async def stream_chunks(body: dict, content: str, latency: float):
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+    for piece in pieces:
+        await asyncio.sleep(latency / len(pieces))
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
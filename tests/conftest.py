@@ -0,0 +1,4 @@
+import os
+
+# app.openai_client refuses to import without a key; tests never reach a real upstream.
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
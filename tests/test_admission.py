@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import admission
+from app.admission import AdmissionController, AdmissionMiddleware, Shed, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_token_bucket_allows_burst_then_reports_wait(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    bucket = TokenBucket(rate=1.0, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == 0.0
+
+def test_full_queue_is_shed():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, queue_depth=1, queue_timeout=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Shed) as shed:
+            await controller.acquire()
+        controller.release(0.01)
+        await waiter
+        controller.release(0.01)
+        return shed.value
+
+    shed = asyncio.run(scenario())
+    assert (shed.reason, shed.status_code) == ("queue_full", 503)
+
+def test_estimated_wait_past_timeout_is_shed_on_arrival():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, queue_depth=10, queue_timeout=1)
+        controller.service_time = 5.0
+        await controller.acquire()
+        with pytest.raises(Shed) as shed:
+            await controller.acquire()
+        return controller, shed.value
+
+    controller, shed = asyncio.run(scenario())
+    assert (shed.reason, shed.status_code) == ("deadline", 503)
+    assert shed.retry_after == pytest.approx(5.0)
+    assert controller.waiting == 0
+
+def test_queued_request_is_shed_when_timeout_passes():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, queue_depth=10, queue_timeout=0.05)
+        controller.service_time = 0.01
+        await controller.acquire()
+        with pytest.raises(Shed) as shed:
+            await controller.acquire()
+        return controller, shed.value
+
+    controller, shed = asyncio.run(scenario())
+    assert shed.reason == "deadline"
+    assert (controller.in_flight, controller.waiting) == (1, 0)
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def post_many(middleware: AdmissionMiddleware, count: int, headers=None) -> list:
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/recommend", headers=headers(index) if headers else None)
+                    for index in range(count)]
+
+    return asyncio.run(scenario())
+
+def test_rate_limited_client_gets_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_MINUTE", 60)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 2)
+    before = admission.admission_shed._values.get(("/recommend", "rate_limited"), 0)
+    responses = post_many(AdmissionMiddleware(ok_app, {"/recommend"}), 3)
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2].headers["Retry-After"] == "1"
+    assert admission.admission_shed._values[("/recommend", "rate_limited")] == before + 1
+
+def test_client_id_header_is_ignored_unless_configured(monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_MINUTE", 60)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 2)
+    rotating = lambda index: {"x-client-id": f"client-{index}"}
+    responses = post_many(AdmissionMiddleware(ok_app, {"/recommend"}), 3, rotating)
+    assert responses[2].status_code == 429
+
+    monkeypatch.setattr(admission, "CLIENT_ID_HEADER", b"x-client-id")
+    responses = post_many(AdmissionMiddleware(ok_app, {"/recommend"}), 3, rotating)
+    assert [response.status_code for response in responses] == [200, 200, 200]
+
+def test_other_paths_bypass_admission(monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_MINUTE", 60)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 1)
+    responses = post_many(AdmissionMiddleware(ok_app, {"/analyze"}), 3)
+    assert [response.status_code for response in responses] == [200, 200, 200]
@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app import openai_client, resilience
+from app.model_router import routed_completion
+from app.resilience import CircuitBreaker, UpstreamUnavailableError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.retry_after() == pytest.approx(20)
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_half_open_allows_one_trial_and_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == pytest.approx(30)
+
+def test_call_upstream_fails_fast_while_open_then_recovers(monkeypatch):
+    monkeypatch.setattr(resilience, "UPSTREAM_RETRIES", 0)
+    monkeypatch.setattr(resilience, "UPSTREAM_HEDGING", False)
+    monkeypatch.setitem(resilience.circuit_breakers, ("test", ""), CircuitBreaker(failure_threshold=2, reset_seconds=0.05))
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        raise openai.APIConnectionError(request=httpx.Request("POST", "http://upstream.test/v1"))
+
+    async def succeeding():
+        nonlocal calls
+        calls += 1
+        return "ok"
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(UpstreamUnavailableError):
+                await resilience.call_upstream("test", failing)
+        with pytest.raises(UpstreamUnavailableError) as rejected:
+            await resilience.call_upstream("test", succeeding)
+        assert rejected.value.retry_after > 0
+        assert calls == 2
+        await asyncio.sleep(0.06)
+        return await resilience.call_upstream("test", succeeding)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert calls == 3
+    assert resilience.circuit_breakers[("test", "")].state == "closed"
+
+def test_cheap_tier_outage_leaves_fallback_tier_available(monkeypatch):
+    monkeypatch.setenv("MODEL_ROUTE_TIERS_TEST", "gpt-4o-mini,gpt-4o")
+    monkeypatch.setattr(resilience, "UPSTREAM_RETRIES", 0)
+    monkeypatch.setattr(resilience, "UPSTREAM_HEDGING", False)
+    for model in ("gpt-4o-mini", "gpt-4o"):
+        monkeypatch.setitem(resilience.circuit_breakers, ("tiers_test", model), CircuitBreaker(failure_threshold=2))
+    calls = []
+
+    async def create(model, **kwargs):
+        calls.append(model)
+        if model == "gpt-4o-mini":
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://upstream.test/v1"))
+        return SimpleNamespace(usage=None, model=model)
+
+    monkeypatch.setattr(openai_client.client.chat.completions, "create", create)
+
+    async def scenario():
+        return [await routed_completion("tiers_test", lambda completion: completion.model) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == ["gpt-4o"] * 4
+    # The mini circuit opened after two failures; later requests went straight to gpt-4o.
+    assert calls == ["gpt-4o-mini", "gpt-4o", "gpt-4o-mini", "gpt-4o", "gpt-4o", "gpt-4o"]
+    stats = resilience.circuit_stats()
+    assert stats["tiers_test/gpt-4o-mini"]["state"] == "open"
+    assert stats["tiers_test/gpt-4o"]["state"] == "closed"
+
+def test_stream_counts_only_outages_as_circuit_failures(monkeypatch):
+    key = ("stream_test", "gpt-4o")
+    monkeypatch.setitem(resilience.circuit_breakers, key, CircuitBreaker(failure_threshold=2))
+    request = httpx.Request("POST", "http://upstream.test/v1")
+    errors = [
+        openai.BadRequestError("bad image", response=httpx.Response(400, request=request), body=None),
+        openai.BadRequestError("bad image", response=httpx.Response(400, request=request), body=None),
+        openai.APIConnectionError(request=request),
+        openai.APIConnectionError(request=request),
+    ]
+
+    async def create(**kwargs):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(openai_client.client.chat.completions, "create", create)
+
+    async def consume():
+        async for _ in openai_client.stream_chat_completion(endpoint="stream_test", model="gpt-4o"):
+            pass
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(openai.BadRequestError):
+                await consume()
+        assert resilience.circuit_breakers[key].state == "closed"
+        for _ in range(2):
+            with pytest.raises(openai.APIConnectionError):
+                await consume()
+        assert resilience.circuit_breakers[key].state == "open"
+        before = resilience.circuit_rejections._values.get(("stream_test",), 0)
+        with pytest.raises(UpstreamUnavailableError):
+            await consume()
+        return resilience.circuit_rejections._values[("stream_test",)] - before
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+from app import cohort
+
+def test_invalid_users_get_an_error_without_failing_the_cohort(monkeypatch):
+    monkeypatch.setattr(cohort, "RECOMMENDATION_ENGINE", "local")
+    users = [
+        {"id": "ok", "food_totals": {"calories": 400}, "user_profile": {"age": 30, "weight": 70, "height": 175}},
+        {"id": "bad-profile", "user_profile": ["not", "a", "profile"]},
+        "not a user",
+        {"id": "bad-time", "current_time": 1230},
+        {"id": "odd-values", "food_totals": {"calories": "inf"},
+         "user_profile": {"weight": "inf", "age": 30, "height": 170, "medicalConditions": 5}},
+    ]
+    output = asyncio.run(cohort.cohort_recommendations(users, "12:30 PM"))
+    results = output["results"]
+    assert [result["id"] for result in results] == ["ok", "bad-profile", None, "bad-time", "odd-values"]
+    assert results[0]["recommendations"]
+    assert results[0]["bmr"] == pytest.approx(10 * 70 + 6.25 * 175 - 5 * 30 - 78, abs=0.1)
+    assert results[1]["error"].startswith("Invalid user: user_profile")
+    assert "error" in results[2]
+    assert results[3]["error"].startswith("Invalid user: current_time")
+    assert "recommendations" in results[4]
+    assert results[4]["remaining"] == "unspecified"
+    assert output["stats"]["users"] == 5
+    assert output["stats"]["invalid_users"] == 3
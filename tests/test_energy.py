@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app.energy import UNKNOWN_SEX_OFFSET, basal_metabolic_rate, energy_budgets, total_energy_expenditure
+from app.get_personalized_recommendations import calculate_remaining_calories
+
+PROFILES = [
+    {"age": 30, "weight": 70, "height": 175, "sex": "male", "stepsPerDay": 10000},
+    {"age": "45", "weight": "62.5", "height": "160", "sex": "F", "stepsPerDay": 3000},
+    {"age": 25, "weight": 80, "height": 180, "stepsPerDay": 14000},
+    {"age": 60, "weight": 55, "height": 150, "gender": "female"},
+    {"age": 40, "weight": 90, "height": 170, "sex": "male", "dailyCalorieTarget": 1800},
+    {"age": 40, "weight": 90, "height": 170, "estimatedExpenditure": 2100},
+]
+
+def scalar_bmr(profile: dict, offset: float) -> float:
+    return float(basal_metabolic_rate(float(profile["age"]), float(profile["weight"]), float(profile["height"]), offset))
+
+def scalar_tdee(profile: dict, offset: float) -> float:
+    return float(total_energy_expenditure(scalar_bmr(profile, offset), float(profile.get("stepsPerDay", 0))))
+
+def test_vectorized_budgets_match_the_scalar_formulas():
+    offsets = [5.0, -161.0, UNKNOWN_SEX_OFFSET, -161.0, 5.0, UNKNOWN_SEX_OFFSET]
+    consumed = np.array([500.0, 0.0, 1200.0, 300.0, 900.0, 100.0])
+    budgets = energy_budgets(PROFILES, consumed)
+    for index, (profile, offset) in enumerate(zip(PROFILES, offsets)):
+        assert budgets["bmr"][index] == pytest.approx(scalar_bmr(profile, offset))
+        assert budgets["tdee"][index] == pytest.approx(scalar_tdee(profile, offset))
+    assert budgets["bmr"][0] == pytest.approx(10 * 70 + 6.25 * 175 - 5 * 30 + 5)
+    assert budgets["tdee"][0] == pytest.approx(budgets["bmr"][0] * 1.725)
+    assert budgets["target"][4] == 1800
+    assert budgets["target"][5] == 2100
+    assert budgets["remaining"] == pytest.approx(budgets["target"] - consumed)
+
+def test_vectorized_budgets_match_the_per_request_budget():
+    consumed = [400.0, 0.0, 1500.0, 250.0, 900.0, 100.0]
+    budgets = energy_budgets(PROFILES, np.array(consumed))
+    for index, profile in enumerate(PROFILES):
+        expected = calculate_remaining_calories({"calories": consumed[index]}, profile)
+        assert budgets["remaining"][index] == pytest.approx(expected, abs=0.5)
+
+def test_missing_or_invalid_fields_give_nan():
+    profiles = [{}, {"age": 30, "weight": "heavy", "height": 170}, {"age": 30, "weight": -5, "height": 170},
+                {"age": 30, "weight": "inf", "height": 170}]
+    budgets = energy_budgets(profiles, np.zeros(len(profiles)))
+    assert np.isnan(budgets["bmr"]).all()
+    assert np.isnan(budgets["remaining"]).all()
+    assert calculate_remaining_calories({"calories": 100}, {}) == "unspecified"
@@ -0,0 +1,68 @@
+import io
+import sqlite3
+
+from PIL import Image, ImageDraw
+
+from app.image_cache import PerceptualImageCache, image_hash
+
+def plate(food=(200, 120, 40), garnish=(40, 140, 60), size=(640, 480)) -> Image.Image:
+    image = Image.new("RGB", size, (235, 230, 220))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.ellipse((width * 0.1, height * 0.1, width * 0.7, height * 0.9), fill=food)
+    draw.rectangle((width * 0.72, height * 0.2, width * 0.9, height * 0.5), fill=garnish)
+    return image
+
+def recompressed(image: Image.Image, scale: float, quality: int) -> Image.Image:
+    resized = image.resize((int(image.width * scale), int(image.height * scale)))
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+def test_near_duplicate_photo_hits():
+    cache = PerceptualImageCache()
+    cache.set(image_hash(plate()), {"name": "Laksa"})
+    assert cache.get(image_hash(recompressed(plate(), 0.5, 60))) == {"name": "Laksa"}
+
+def test_different_layout_misses():
+    cache = PerceptualImageCache()
+    cache.set(image_hash(plate()), {"name": "Laksa"})
+    assert cache.get(image_hash(plate().transpose(Image.Transpose.FLIP_LEFT_RIGHT))) is None
+
+def test_same_layout_in_other_colors_misses():
+    cache = PerceptualImageCache()
+    cache.set(image_hash(plate()), {"name": "Laksa"})
+    assert cache.get(image_hash(plate(food=(90, 60, 30), garnish=(20, 70, 30)))) is None
+
+def test_flat_images_are_not_cached_or_matched():
+    black = Image.new("RGB", (320, 240), (0, 0, 0))
+    orange = Image.new("RGB", (320, 240), (255, 140, 0))
+    assert image_hash(black) is None
+    assert image_hash(orange) is None
+    cache = PerceptualImageCache()
+    cache.set(image_hash(orange), {"name": "Orange"})
+    assert cache.get(image_hash(black)) is None
+    assert len(list(cache.memory.keys())) == 0
+
+def test_sqlite_tier_persists_and_reloads(tmp_path):
+    path = str(tmp_path / "cache.db")
+    key = image_hash(plate())
+    PerceptualImageCache(db_path=path).set(key, {"name": "Laksa"})
+    reloaded = PerceptualImageCache(db_path=path)
+    assert reloaded.get(key) == {"name": "Laksa"}
+
+def test_sqlite_tier_prunes_expired_and_excess_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PerceptualImageCache(db_path=path, maxsize=2, ttl=3600)
+    keys = [(index, index) for index in range(4)]
+    for index, key in enumerate(keys):
+        cache.set(key, {"index": index})
+    # Age the newest row past the TTL; the next two are the newest unexpired ones.
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE image_analyses SET created = created - 7200 WHERE phash = 3")
+    reloaded = PerceptualImageCache(db_path=path, maxsize=2, ttl=3600)
+    with sqlite3.connect(path) as db:
+        rows = sorted(phash for (phash,) in db.execute("SELECT phash FROM image_analyses"))
+    assert rows == [1, 2]
+    assert reloaded.memory.get(keys[3]) is None
+    assert reloaded.memory.get(keys[2]) == {"index": 2}
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.jobs import JobQueue, QueueFull
+from app.resilience import UpstreamTimeoutError
+
+def run_with_queue(scenario, **settings):
+    async def wrapper():
+        queue = JobQueue(**{"workers": 2, "queue_depth": 8, "result_ttl": 60, "store_size": 100, **settings})
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(wrapper())
+
+def test_same_key_is_deduplicated_while_pending_and_after_done():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"calories": 600}
+
+    async def scenario(queue):
+        first = queue.submit("image-hash", work)
+        pending = queue.submit("image-hash", work)
+        await queue.wait(first.id, timeout=1)
+        done = queue.submit("image-hash", work)
+        return first, pending, done, queue.stats()
+
+    first, pending, done, stats = run_with_queue(scenario)
+    assert pending is first and done is first
+    assert first.to_dict() == {"job_id": first.id, "status": "done", "result": {"calories": 600}}
+    assert calls == 1
+    assert (stats["submitted"], stats["deduplicated"], stats["done"]) == (1, 2, 1)
+
+def test_failed_job_is_retried_on_resubmission():
+    outcomes = [UpstreamTimeoutError("Upstream model API did not answer in time."), {"calories": 600}]
+
+    async def work():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario(queue):
+        failed = queue.submit("image-hash", work)
+        await queue.wait(failed.id, timeout=1)
+        retried = queue.submit("image-hash", work)
+        await queue.wait(retried.id, timeout=1)
+        return failed, retried, queue.stats()
+
+    failed, retried, stats = run_with_queue(scenario)
+    assert failed.to_dict() == {"job_id": failed.id, "status": "failed",
+                                "error": "Upstream model API did not answer in time.", "error_status": 504}
+    assert retried is not failed
+    assert retried.status == "done"
+    assert (stats["submitted"], stats["deduplicated"], stats["failed"], stats["done"]) == (2, 0, 1, 1)
+
+def test_http_and_unexpected_errors_keep_their_status():
+    async def rejected():
+        raise HTTPException(status_code=422, detail="Not an image.")
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    async def scenario(queue):
+        first = queue.submit("a", rejected)
+        second = queue.submit("b", broken)
+        await queue.wait(first.id, timeout=1)
+        await queue.wait(second.id, timeout=1)
+        return first, second
+
+    first, second = run_with_queue(scenario)
+    assert (first.status, first.error, first.status_code) == ("failed", "Not an image.", 422)
+    assert (second.status, second.error, second.status_code) == ("failed", "boom", 500)
+
+def test_submissions_beyond_queue_depth_are_refused():
+    release = None
+
+    async def blocked():
+        await release.wait()
+
+    async def scenario(queue):
+        nonlocal release
+        release = asyncio.Event()
+        queue.submit("running", blocked)
+        await asyncio.sleep(0)
+        queue.submit("queued", blocked)
+        with pytest.raises(QueueFull):
+            queue.submit("refused", blocked)
+        release.set()
+
+    run_with_queue(scenario, workers=1, queue_depth=1)
+
+def test_wait_returns_none_for_unknown_jobs():
+    async def scenario(queue):
+        return await queue.wait("missing", timeout=0.01)
+
+    assert run_with_queue(scenario) is None
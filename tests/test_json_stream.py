@@ -0,0 +1,38 @@
+from app.json_stream import JSONArrayItemParser
+
+ANSWER = '```json\n{"recommendations": [{"food": "Thosai", "calories": 220}, {"food": "Laksa [small]", "calories": 450}]}\n```'
+
+def feed_in_chunks(parser: JSONArrayItemParser, text: str, size: int) -> list:
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+def test_returns_items_as_they_close():
+    parser = JSONArrayItemParser("recommendations")
+    first_end = ANSWER.index("}") + 1
+    assert parser.feed(ANSWER[:first_end - 1]) == []
+    assert parser.feed(ANSWER[first_end - 1:first_end]) == [{"food": "Thosai", "calories": 220}]
+    assert parser.feed(ANSWER[first_end:]) == [{"food": "Laksa [small]", "calories": 450}]
+
+def test_chunk_boundaries_do_not_change_items():
+    expected = [{"food": "Thosai", "calories": 220}, {"food": "Laksa [small]", "calories": 450}]
+    for size in (1, 2, 7, len(ANSWER)):
+        assert feed_in_chunks(JSONArrayItemParser("recommendations"), ANSWER, size) == expected
+
+def test_truncated_stream_drops_partial_item():
+    truncated = ANSWER[:ANSWER.index('"Laksa') + 10]
+    parser = JSONArrayItemParser("recommendations")
+    assert feed_in_chunks(parser, truncated, 3) == [{"food": "Thosai", "calories": 220}]
+    assert parser.item_start is not None
+    assert not parser.done
+
+def test_braces_inside_strings_do_not_close_items():
+    parser = JSONArrayItemParser("items")
+    assert parser.feed('{"items": [{"note": "a } and \\" {"}') == [{"note": 'a } and " {'}]
+
+def test_text_after_array_is_ignored():
+    parser = JSONArrayItemParser("items")
+    assert parser.feed('{"items": [{"a": 1}], "other": [{"b": 2}]}') == [{"a": 1}]
+    assert parser.done
+    assert parser.feed('{"c": 3}') == []
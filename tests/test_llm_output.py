@@ -0,0 +1,54 @@
+import pytest
+
+from app.llm_output import (
+    LLMOutputDecodeError,
+    LLMOutputEmptyError,
+    LLMOutputTruncatedError,
+    parse_llm_json,
+)
+
+@pytest.mark.parametrize("text", [
+    '{"a": 1}',
+    '```json\n{"a": 1}\n```',
+    '```\n{"a": 1}\n```',
+    'Here is the answer:\n```json\n{"a": 1}\n```\nLet me know if you need more.',
+    'Here is the answer: {"a": 1}',
+    '{"a": 1}\nHope this helps!',
+    'Sure [note]: {"a": 1}',
+    'See [1]: {"a": 1}',
+    '{"a": 1} (see [1])',
+    'Answer [draft] {"a": 1} [end]',
+])
+def test_object_is_found_in_fences_and_prose(text):
+    assert parse_llm_json(text) == {"a": 1}
+
+def test_nested_brackets_are_kept():
+    text = 'Result [v2]: {"recommendations": [{"food": "Laksa [small]", "n": [1, 2]}]} done'
+    assert parse_llm_json(text) == {"recommendations": [{"food": "Laksa [small]", "n": [1, 2]}]}
+
+def test_top_level_array():
+    assert parse_llm_json('Items:\n[{"a": 1}, {"b": 2}]') == [{"a": 1}, {"b": 2}]
+
+@pytest.mark.parametrize("text", [
+    '{"recommendations": [{"food": "Laksa", "cal',
+    '```json\n{"a": [1, 2',
+    'Sure [note]: {"a": [1, 2',
+    '{"food": "Chicken Rice", "note": "unfinished',
+])
+def test_truncated_output(text):
+    with pytest.raises(LLMOutputTruncatedError):
+        parse_llm_json(text)
+
+@pytest.mark.parametrize("text", [None, "", "   \n"])
+def test_empty_output(text):
+    with pytest.raises(LLMOutputEmptyError):
+        parse_llm_json(text)
+
+@pytest.mark.parametrize("text", [
+    "I could not identify a dish in this photo.",
+    '{"a": 1,}',
+    "Sure [note]: nothing to add",
+])
+def test_invalid_output(text):
+    with pytest.raises(LLMOutputDecodeError):
+        parse_llm_json(text)
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import model_router
+from app.llm_output import LLMOutputError, parse_llm_json
+from app.model_router import check_confidence, routed_completion
+
+ROUTE = "gpt-4o-mini,gpt-4o,gpt-4.1"
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Replaces create_chat_completion with a fake answering each model with the text in
+    upstream.answers[model], and records (model, deadline) for every call.
+    """
+    monkeypatch.setenv("MODEL_ROUTE_ROUTER_TEST", ROUTE)
+    fake = SimpleNamespace(answers={}, calls=[])
+
+    async def create_chat_completion(endpoint, model, deadline, **kwargs):
+        fake.calls.append((model, deadline))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=fake.answers[model]))])
+
+    monkeypatch.setattr(model_router, "create_chat_completion", create_chat_completion)
+    return fake
+
+def parse(completion) -> dict:
+    return parse_llm_json(completion.choices[0].message.content)
+
+def validate(output: dict) -> None:
+    check_confidence(output["confidence"])
+
+def route():
+    return asyncio.run(routed_completion("router_test", parse, validate, messages=[]))
+
+def models(upstream) -> list:
+    return [model for model, _ in upstream.calls]
+
+def test_first_tier_answer_is_accepted(upstream):
+    upstream.answers = {"gpt-4o-mini": '{"confidence": 0.9}'}
+    before = dict(model_router.route_stats[("router_test", "gpt-4o-mini")])
+    assert route() == {"confidence": 0.9}
+    assert models(upstream) == ["gpt-4o-mini"]
+    assert model_router.route_stats[("router_test", "gpt-4o-mini")]["accepted"] == before["accepted"] + 1
+
+def test_low_confidence_escalates_to_next_tier(upstream):
+    upstream.answers = {"gpt-4o-mini": '{"confidence": 0.1}', "gpt-4o": '{"confidence": 0.8}'}
+    assert route() == {"confidence": 0.8}
+    assert models(upstream) == ["gpt-4o-mini", "gpt-4o"]
+
+def test_parse_error_escalates_to_next_tier(upstream):
+    upstream.answers = {"gpt-4o-mini": "I cannot tell", "gpt-4o": '{"confidence": 0.7}'}
+    assert route() == {"confidence": 0.7}
+    assert models(upstream) == ["gpt-4o-mini", "gpt-4o"]
+
+def test_last_tier_low_confidence_answer_is_returned_unverified(upstream):
+    upstream.answers = dict.fromkeys(ROUTE.split(","), '{"confidence": 0.2}')
+    unverified = model_router.route_stats[("router_test", "gpt-4.1")]["unverified"]
+    assert route() == {"confidence": 0.2}
+    assert models(upstream) == ROUTE.split(",")
+    assert model_router.route_stats[("router_test", "gpt-4.1")]["unverified"] == unverified + 1
+
+def test_last_tier_parse_error_is_raised(upstream):
+    upstream.answers = {"gpt-4o-mini": '{"confidence": 0.1}', "gpt-4o": "{", "gpt-4.1": "no JSON here"}
+    failed = model_router.route_stats[("router_test", "gpt-4.1")]["failed"]
+    with pytest.raises(LLMOutputError):
+        route()
+    assert models(upstream) == ROUTE.split(",")
+    assert model_router.route_stats[("router_test", "gpt-4.1")]["failed"] == failed + 1
+
+def test_last_tier_validation_error_other_than_low_confidence_is_raised(upstream):
+    upstream.answers = dict.fromkeys(ROUTE.split(","), '{"score": 1}')
+    with pytest.raises(KeyError):
+        route()
+
+def test_tiers_share_one_deadline(upstream, monkeypatch):
+    monkeypatch.setenv("UPSTREAM_DEADLINE_ROUTER_TEST", "7")
+    upstream.answers = {"gpt-4o-mini": '{"confidence": 0.1}', "gpt-4o": "oops", "gpt-4.1": '{"confidence": 1}'}
+
+    async def scenario():
+        start = asyncio.get_running_loop().time()
+        await routed_completion("router_test", parse, validate, messages=[])
+        return start
+
+    start = asyncio.run(scenario())
+    deadlines = {deadline for _, deadline in upstream.calls}
+    assert len(upstream.calls) == 3
+    assert len(deadlines) == 1
+    assert deadlines.pop() == pytest.approx(start + 7, abs=0.5)
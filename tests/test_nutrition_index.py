@@ -0,0 +1,52 @@
+import pytest
+
+from app.nutrition_index import NUTRITION_INDEX_MIN_CONFIDENCE, NutritionIndex, normalize_name, nutrition_index
+
+def row(name: str, aliases: str = "", calories: float = 100, meals: str = "") -> dict:
+    values = dict.fromkeys(("carbs", "protein", "fats", "sodium", "fiber", "vitamin_a", "vitamin_c", "vitamin_d"), 1)
+    return {"name": name, "aliases": aliases, "category": "meal", "calories": calories, "meals": meals, **values}
+
+def test_normalize_name():
+    assert normalize_name("  Char-Kway   Teow!! ") == "char kway teow"
+
+@pytest.mark.parametrize("query", ["Chicken Rice", "chicken rice", "CHICKEN-RICE", "hainanese chicken rice"])
+def test_exact_name_or_alias_matches_fully(query):
+    dish, confidence = nutrition_index.match(query)
+    assert nutrition_index.names[dish] == "Chicken Rice"
+    assert confidence == 1.0
+
+@pytest.mark.parametrize("query, expected", [
+    ("chiken rice", "Chicken Rice"),
+    ("hainanese chicken", "Chicken Rice"),
+    ("fish soup", "Sliced Fish Soup"),
+    ("kaya toast", "Kaya Toast Set"),
+])
+def test_typos_and_partial_names_match(query, expected):
+    dish, confidence = nutrition_index.match(query)
+    assert nutrition_index.names[dish] == expected
+    assert confidence >= NUTRITION_INDEX_MIN_CONFIDENCE
+    assert nutrition_index.lookup(query) is not None
+
+@pytest.mark.parametrize("query", ["pizza margherita", "sushi", "beef burger", "chicken rice with egg"])
+def test_no_match_above_the_threshold_returns_none(query):
+    _, confidence = nutrition_index.match(query)
+    assert confidence < NUTRITION_INDEX_MIN_CONFIDENCE
+    assert nutrition_index.lookup(query) is None
+
+def test_unrelated_query_matches_nothing():
+    assert nutrition_index.match("zzz") == (None, 0.0)
+
+def test_lookup_scales_by_portion():
+    index = NutritionIndex([row("Laksa", "curry laksa", calories=591)])
+    assert index.lookup("curry laksa")["calories"] == 591
+    half = index.lookup("Laksa", portion=0.5)
+    assert half["calories"] == 295.5
+    assert half["vitamins"] == {"vitamin_a": 0.5, "vitamin_c": 0.5, "vitamin_d": 0.5}
+
+def test_ties_resolve_to_the_first_dish():
+    index = NutritionIndex([row("Fried Rice"), row("Fried Rice", calories=900)])
+    assert index.match("fried rice") == (0, 1.0)
+
+def test_meals_column():
+    index = NutritionIndex([row("Kaya Toast Set", meals="breakfast"), row("Satay", meals="")])
+    assert index.meals == [("breakfast",), ()]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.recommendation_cache import (
+    AGE_BAND,
+    CALORIE_BUCKET,
+    STEPS_BAND,
+    WEIGHT_BAND,
+    normalize_conditions,
+    personalize_cached,
+    recommendation_cache_key,
+)
+
+PROFILE = {
+    "age": 34,
+    "weight": 71.0,
+    "height": 172,
+    "targetWeight": 66,
+    "targetLoss": 5,
+    "stepsPerDay": 6000,
+    "medicalConditions": "High Cholesterol, diabetes",
+}
+
+def key(remaining_cal=1210, meal_context="lunch", **changes):
+    return recommendation_cache_key(dict(PROFILE, **changes), meal_context, remaining_cal)
+
+def test_profiles_within_one_step_share_a_key():
+    assert key() == key(1210 + CALORIE_BUCKET / 2)
+    assert key() == key(age=34 + AGE_BAND / 2)
+    assert key() == key(weight=71.0 + WEIGHT_BAND / 2)
+    assert key() == key(stepsPerDay=6000 + STEPS_BAND / 2)
+    assert key() == key(weight="72.5", age="35")
+    assert key() == key(medicalConditions=["diabetes", " high cholesterol "])
+
+def test_profiles_across_a_boundary_do_not_share_a_key():
+    # Each pair is one unit apart but on either side of a band edge.
+    assert key(CALORIE_BUCKET * 12 - 1) != key(CALORIE_BUCKET * 12)
+    assert key(age=AGE_BAND * 4 - 1) != key(age=AGE_BAND * 4)
+    assert key(weight=WEIGHT_BAND * 14 - 0.5) != key(weight=WEIGHT_BAND * 14)
+    assert key(stepsPerDay=STEPS_BAND * 2 - 1) != key(stepsPerDay=STEPS_BAND * 2)
+    assert key(meal_context="dinner") != key()
+    assert key(medicalConditions="diabetes") != key()
+
+def test_missing_and_invalid_values_band_to_none():
+    assert key("unspecified")[1] is None
+    assert key(age=None)[3] is None
+    assert key(weight="heavy")[4] is None
+    assert key(height=float("inf"))[5] is None
+
+@pytest.mark.parametrize("conditions, expected", [
+    (None, ()),
+    ("", ()),
+    ("Diabetes, ,HYPERTENSION", ("diabetes", "hypertension")),
+    (["asthma", "Asthma"], ("asthma",)),
+    (5, ("5",)),
+])
+def test_normalize_conditions(conditions, expected):
+    assert normalize_conditions(conditions) == expected
+
+def test_personalize_cached_recomputes_remaining_after_on_a_copy():
+    cached = {"recommendations": [
+        {"food": "Laksa", "estimatedNutrition": {"calories": 600}, "remainingAfter": 400},
+        {"food": "Drink water", "estimatedNutrition": {}, "remainingAfter": 1000},
+    ]}
+    personalized = personalize_cached(cached, 1250)
+    assert [item["remainingAfter"] for item in personalized["recommendations"]] == [650, 1000]
+    assert cached["recommendations"][0]["remainingAfter"] == 400
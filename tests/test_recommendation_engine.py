@@ -0,0 +1,48 @@
+from app.recommendation_engine import LOW_BUDGET_CALORIES, REST_RECOMMENDATION, rank_recommendations
+
+def dishes(output: dict) -> list:
+    return [item for item in output["recommendations"] if item["food"] != REST_RECOMMENDATION["food"]]
+
+def test_unmatched_condition_adds_no_limit_sentence():
+    output = rank_recommendations({}, {"medicalConditions": "asthma"}, "lunch", 1500)
+    assert dishes(output)
+    for item in dishes(output):
+        assert "limit" not in item["explanation"]
+        assert "asthma" not in item["explanation"]
+
+def test_no_conditions_adds_no_limit_sentence():
+    for item in dishes(rank_recommendations({}, {}, "dinner", 1500)):
+        assert "limit" not in item["explanation"]
+
+def test_diabetes_caps_carbs_and_names_only_that_limit():
+    output = rank_recommendations({}, {"medicalConditions": ["Diabetes", "asthma"]}, "lunch", 1500)
+    assert dishes(output)
+    for item in dishes(output):
+        assert item["estimatedNutrition"]["carbs"] <= 60
+        assert "within the 60g limit for diabetes." in item["explanation"]
+        assert "Sodium" not in item["explanation"]
+        assert "asthma" not in item["explanation"]
+
+def test_hypertension_caps_sodium():
+    output = rank_recommendations({}, {"medicalConditions": "high blood pressure"}, "dinner", 1500)
+    for item in dishes(output):
+        assert item["estimatedNutrition"]["sodium"] <= 800
+        assert "within the 800mg limit for high blood pressure." in item["explanation"]
+
+def test_breakfast_only_dishes_are_not_offered_for_dinner():
+    for remaining in (300, 600, 1000, 1500, 2500):
+        foods = [item["food"] for item in dishes(rank_recommendations({}, {}, "dinner", remaining))]
+        assert not any(food.startswith(("Kaya Toast Set", "Chwee Kueh")) for food in foods)
+
+def test_low_budget_puts_rest_first():
+    output = rank_recommendations({}, {}, "dinner", LOW_BUDGET_CALORIES - 1)
+    first = output["recommendations"][0]
+    assert first["food"] == REST_RECOMMENDATION["food"]
+    assert first["remainingAfter"] == LOW_BUDGET_CALORIES - 1
+    assert dishes(output)
+
+def test_ranking_is_deterministic():
+    profile = {"medicalConditions": "cholesterol"}
+    first = rank_recommendations({"sodium": 900}, profile, "lunch", 1200)
+    assert first == rank_recommendations({"sodium": 900}, profile, "lunch", 1200)
+    assert len({item["food"] for item in dishes(first)}) == len(dishes(first))
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_result():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"calls": calls}
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+def test_error_is_raised_to_every_coalesced_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(4)), return_exceptions=True)
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(result, ValueError) and str(result) == "upstream failed" for result in results)
+    assert flight.stats() == {"executed": 1, "coalesced": 3, "in_flight": 0}
+
+def test_failed_key_runs_again_on_the_next_call():
+    async def scenario():
+        flight = SingleFlight()
+        outcomes = [ValueError("first"), "second"]
+
+        async def work():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with pytest.raises(ValueError):
+            await flight.do("key", work)
+        return flight, await flight.do("key", work)
+
+    flight, result = asyncio.run(scenario())
+    assert result == "second"
+    assert flight.executed == 2
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
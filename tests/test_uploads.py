@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.uploads import MaxBodySizeMiddleware, read_upload
+
+LIMIT = 4096
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    # /raw reads the whole part, so only the middleware limits its body.
+    @app.post("/raw")
+    async def raw(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @app.post("/analyze")
+    async def analyze(file: UploadFile = File(...)):
+        return {"size": len(await read_upload(file, max_bytes=LIMIT))}
+
+    app.add_middleware(MaxBodySizeMiddleware, limits={"/raw": LIMIT + 1024, "/analyze": LIMIT + 1024})
+    return app
+
+def multipart(size: int) -> tuple:
+    boundary = "bench-boundary"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"meal.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + b"\xff" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+def post(body: bytes, headers: dict, chunked: bool, path: str = "/raw") -> httpx.Response:
+    async def chunks():
+        for start in range(0, len(body), 1000):
+            yield body[start:start + 1000]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, content=chunks() if chunked else body, headers=headers)
+
+    return asyncio.run(scenario())
+
+def test_chunked_body_over_limit_gets_413():
+    body, headers = multipart(LIMIT * 4)
+    response = post(body, headers, chunked=True)
+    assert response.status_code == 413
+
+def test_declared_length_over_limit_gets_413():
+    body, headers = multipart(LIMIT * 4)
+    response = post(body, headers, chunked=False)
+    assert response.status_code == 413
+
+def test_chunked_body_within_limit_is_read():
+    body, headers = multipart(LIMIT)
+    response = post(body, headers, chunked=True)
+    assert response.status_code == 200
+    assert response.json() == {"size": LIMIT}
+
+def test_file_over_upload_limit_gets_413_inside_body_limit():
+    body, headers = multipart(LIMIT + 1)
+    response = post(body, headers, chunked=True, path="/analyze")
+    assert response.status_code == 413
+    assert "upload limit" in response.json()["detail"]